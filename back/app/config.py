@@ -1,25 +1,21 @@
 import os
+import tempfile
 from typing import List
 from pathlib import Path
 
+# Load .env once, before the settings below read the environment: the first of
+# back/.env and app/.env that exists; real environment variables win over it.
 try:
     from dotenv import load_dotenv
     
     current_dir = Path(__file__).parent
-    env_path = current_dir.parent / '.env'  
-    if env_path.exists():
-        load_dotenv(env_path)
-        print(f"✅ Завантажено .env з {env_path}")
-    else:
-        env_path = current_dir / '.env'
+    for env_path in (current_dir.parent / '.env', current_dir / '.env'):
         if env_path.exists():
             load_dotenv(env_path)
-            print(f"✅ Завантажено .env з {env_path}")
-        else:
-            print(f"⚠️ .env файл не знайдено в {current_dir.parent} або {current_dir}")
+            break
             
 except ImportError:
-    print("❌ python-dotenv не встановлено!")
+    pass
 
 class Settings:
     # App settings
@@ -30,20 +26,108 @@ class Settings:
     # Server settings
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
+    WORKERS: int = int(os.getenv("WORKERS", "1"))
+    
+    # State shared between workers: "memory" (single process) or "sqlite" (one host)
+    STATE_BACKEND: str = os.getenv("STATE_BACKEND", "sqlite" if WORKERS > 1 else "memory")
+    
+    # Per-account Telegram connection leases (seconds)
+    CLIENT_LEASE_TTL: int = int(os.getenv("CLIENT_LEASE_TTL", "15"))
+    CLIENT_LEASE_RENEW_INTERVAL: float = float(os.getenv("CLIENT_LEASE_RENEW_INTERVAL", "2"))
+    CLIENT_LEASE_WAIT: float = float(os.getenv("CLIENT_LEASE_WAIT", "10"))
+    
+    # Private Unix sockets on which workers accept requests forwarded by their
+    # peers; requests of an account are served by the worker holding its lease
+    WORKER_SOCKET_DIR: str = os.getenv(
+        "WORKER_SOCKET_DIR", os.path.join(tempfile.gettempdir(), "telegram-viewer-workers")
+    )
     
     # Database settings
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./telegram_viewer.db")
     DATABASE_NAME: str = "telegram_viewer.db"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "8"))
     
     # Security settings
     JWT_SECRET: str = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_DAYS: int = 7
+
+    # Auth cache settings (sizes in entries, TTLs in seconds)
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    TOKEN_CACHE_TTL: int = int(os.getenv("TOKEN_CACHE_TTL", "3600"))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", "30"))
+
+    # Password hashing (scrypt cost parameters, KDF threads)
+    PASSWORD_SCRYPT_N: int = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+    PASSWORD_SCRYPT_R: int = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+    PASSWORD_SCRYPT_P: int = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
     
     # Telegram API settings
     TELEGRAM_API_ID: int = int(os.getenv("TELEGRAM_API_ID", "0"))
     TELEGRAM_API_HASH: str = os.getenv("TELEGRAM_API_HASH", "")
-    
+
+    # Pending login settings (seconds; clients kept connected, persisted requests)
+    PENDING_LOGIN_TTL: int = int(os.getenv("PENDING_LOGIN_TTL", "300"))
+    PENDING_LOGIN_MAX_CLIENTS: int = int(os.getenv("PENDING_LOGIN_MAX_CLIENTS", "100"))
+    PENDING_LOGIN_MAX: int = int(os.getenv("PENDING_LOGIN_MAX", "1000"))
+    PENDING_LOGIN_REAP_INTERVAL: int = int(os.getenv("PENDING_LOGIN_REAP_INTERVAL", "30"))
+
+    # Telegram client pool settings
+    CLIENT_POOL_MAX_SIZE: int = int(os.getenv("CLIENT_POOL_MAX_SIZE", "100"))
+    CLIENT_POOL_IDLE_TIMEOUT: int = int(os.getenv("CLIENT_POOL_IDLE_TIMEOUT", "900"))
+    CLIENT_POOL_HEALTH_CHECK_INTERVAL: int = int(os.getenv("CLIENT_POOL_HEALTH_CHECK_INTERVAL", "60"))
+
+    # Sender display name cache (entries, seconds)
+    SENDER_CACHE_USERS: int = int(os.getenv("SENDER_CACHE_USERS", "1000"))
+    SENDER_CACHE_SIZE: int = int(os.getenv("SENDER_CACHE_SIZE", "5000"))
+    SENDER_CACHE_REFRESH_INTERVAL: int = int(os.getenv("SENDER_CACHE_REFRESH_INTERVAL", "86400"))
+
+    # Local message store freshness (seconds): newest pages synced within the
+    # TTL are served as is, older ones up to the max staleness are served and
+    # revalidated in the background
+    MESSAGE_FRESH_TTL: int = int(os.getenv("MESSAGE_FRESH_TTL", "15"))
+    MESSAGE_MAX_STALE: int = int(os.getenv("MESSAGE_MAX_STALE", "300"))
+
+    # Batch message fetch settings
+    BATCH_FETCH_CONCURRENCY: int = int(os.getenv("BATCH_FETCH_CONCURRENCY", "5"))
+
+    # Chat export settings
+    EXPORT_CHUNK_SIZE: int = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+    EXPORT_FLOOD_WAIT_MAX_SLEEP: int = int(os.getenv("EXPORT_FLOOD_WAIT_MAX_SLEEP", "300"))
+
+    # Background sync settings (seconds for intervals)
+    SYNC_ENABLED: bool = os.getenv("SYNC_ENABLED", "True").lower() == "true"
+    SYNC_WORKERS: int = int(os.getenv("SYNC_WORKERS", "4"))
+    SYNC_QUEUE_SIZE: int = int(os.getenv("SYNC_QUEUE_SIZE", "1000"))
+    SYNC_INTERVAL: int = int(os.getenv("SYNC_INTERVAL", "60"))
+    SYNC_ACTIVE_WINDOW: int = int(os.getenv("SYNC_ACTIVE_WINDOW", "1800"))
+    SYNC_CHATS_PER_USER: int = int(os.getenv("SYNC_CHATS_PER_USER", "10"))
+    SYNC_MESSAGES_PER_CHAT: int = int(os.getenv("SYNC_MESSAGES_PER_CHAT", "50"))
+
+    # Outbound Telegram call scheduling (requests per second per account, seconds)
+    TELEGRAM_RATE_LIMIT: float = float(os.getenv("TELEGRAM_RATE_LIMIT", "5"))
+    TELEGRAM_RATE_BURST: int = int(os.getenv("TELEGRAM_RATE_BURST", "10"))
+    TELEGRAM_REQUEST_DEADLINE: float = float(os.getenv("TELEGRAM_REQUEST_DEADLINE", "30"))
+
+    # Dialog cache settings (seconds)
+    DIALOG_CACHE_TTL: int = int(os.getenv("DIALOG_CACHE_TTL", "30"))
+    DIALOG_CACHE_MAX_STALE: int = int(os.getenv("DIALOG_CACHE_MAX_STALE", "600"))
+    DIALOG_CACHE_MAX_ENTRIES: int = int(os.getenv("DIALOG_CACHE_MAX_ENTRIES", "1000"))
+    DIALOG_SCAN_LIMIT: int = int(os.getenv("DIALOG_SCAN_LIMIT", "1000"))
+
+    # Real-time update stream settings
+    UPDATE_QUEUE_SIZE: int = int(os.getenv("UPDATE_QUEUE_SIZE", "100"))
+    UPDATE_KEEPALIVE_INTERVAL: int = int(os.getenv("UPDATE_KEEPALIVE_INTERVAL", "15"))
+    # EventSource cannot send headers: the stream takes a short-lived token in its URL
+    UPDATE_TOKEN_EXPIRE_SECONDS: int = int(os.getenv("UPDATE_TOKEN_EXPIRE_SECONDS", "60"))
+
+    # Media cache settings (bytes, seconds)
+    MEDIA_CACHE_DIR: str = os.getenv("MEDIA_CACHE_DIR", "media_cache")
+    MEDIA_CACHE_MAX_BYTES: int = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(1024 ** 3)))
+    MEDIA_CACHE_MAX_AGE: int = int(os.getenv("MEDIA_CACHE_MAX_AGE", "86400"))
+
     # CORS settings
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -56,21 +140,10 @@ class Settings:
     if os.getenv("FRONTEND_URL"):
         ALLOWED_ORIGINS.append(os.getenv("FRONTEND_URL"))
     
-    def __init__(self):
-        # Виводимо налагоджувальну інформацію
-        print(f"🔧 Конфігурація створена:")
-        print(f"   - API_ID з змінної: {os.getenv('TELEGRAM_API_ID', 'НЕ ЗНАЙДЕНО')}")
-        print(f"   - API_HASH з змінної: {os.getenv('TELEGRAM_API_HASH', 'НЕ ЗНАЙДЕНО')}")
-        print(f"   - JWT_SECRET з змінної: {os.getenv('JWT_SECRET', 'НЕ ЗНАЙДЕНО')}")
-        print(f"   - Підсумок API_ID: {self.TELEGRAM_API_ID}")
-        print(f"   - Підсумок API_HASH: {'встановлено' if self.TELEGRAM_API_HASH else 'НЕ встановлено'}")
-    
     @property
     def telegram_configured(self) -> bool:
         """Check if Telegram API credentials are configured"""
-        is_configured = self.TELEGRAM_API_ID > 0 and len(self.TELEGRAM_API_HASH) > 0
-        print(f"🔍 telegram_configured: {is_configured} (API_ID: {self.TELEGRAM_API_ID}, API_HASH length: {len(self.TELEGRAM_API_HASH)})")
-        return is_configured
+        return self.TELEGRAM_API_ID > 0 and len(self.TELEGRAM_API_HASH) > 0
 
 # Create settings instance
 settings = Settings()
@@ -86,6 +159,13 @@ def validate_config():
     if settings.JWT_SECRET == "your-secret-key-change-in-production":
         errors.append("JWT_SECRET should be changed from default value")
     
+    # Pre-warmed pages must still be servable locally when the next round runs
+    if settings.SYNC_ENABLED and settings.SYNC_INTERVAL >= settings.MESSAGE_MAX_STALE:
+        errors.append("SYNC_INTERVAL should be shorter than MESSAGE_MAX_STALE, or pre-warmed pages expire before the next sync")
+    
+    if settings.WORKERS > 1 and settings.STATE_BACKEND == "memory":
+        errors.append("STATE_BACKEND=memory cannot coordinate multiple workers, use sqlite")
+    
     if errors:
         print("⚠️  Configuration warnings:")
         for error in errors:
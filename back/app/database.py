@@ -1,27 +1,43 @@
 import sqlite3
+import asyncio
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-import hashlib
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Set, TypeVar
+
+from .config import settings
+from .cache import TTLCache
+from .metrics import DB_QUERY_LATENCY, DB_WAIT_LATENCY, service_stats
 
 DATABASE_NAME = "telegram_viewer.db"
 
-def init_database():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+T = TypeVar("T")
 
-    #Users table
-    cursor.execute('''
+# Short-lived caches for rows read on every authenticated request. Sessions
+# change on verify and disconnect, which another worker cannot invalidate
+# here, so they are only cached while a single process serves the app.
+_user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+_session_cache = TTLCache(
+    settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL if settings.STATE_BACKEND == "memory" else 0
+)
+_MISSING = object()
+
+# Schema migrations as (version, description, statements), applied in order.
+# The applied version is tracked in SQLite's PRAGMA user_version.
+MIGRATIONS = [
+    (1, "Users and Telegram sessions", [
+        '''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
             password_hash TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
-        
-    # Telegram sessions table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS telegram_sessions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -31,31 +47,372 @@ def init_database():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
-    ''')
+        ''',
+    ]),
+    (2, "Local message store", [
+        '''
+        CREATE TABLE IF NOT EXISTS messages (
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            date TEXT NOT NULL,
+            from_user TEXT,
+            from_user_id INTEGER,
+            PRIMARY KEY (user_id, chat_id, message_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        # Contiguous range of stored messages per chat
+        '''
+        CREATE TABLE IF NOT EXISTS message_sync_state (
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            oldest_id INTEGER NOT NULL,
+            newest_id INTEGER NOT NULL,
+            history_complete BOOLEAN DEFAULT FALSE,
+            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, chat_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+    ]),
+    (3, "Session lookup indexes", [
+        # Keep only the newest active session per user before enforcing it
+        '''
+        UPDATE telegram_sessions SET is_active = FALSE
+        WHERE is_active = TRUE AND id NOT IN (
+            SELECT MAX(id) FROM telegram_sessions WHERE is_active = TRUE GROUP BY user_id
+        )
+        ''',
+        "DELETE FROM telegram_sessions WHERE is_active = FALSE",
+        "CREATE INDEX IF NOT EXISTS idx_telegram_sessions_user_active ON telegram_sessions (user_id, is_active)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_telegram_sessions_one_active ON telegram_sessions (user_id) WHERE is_active = TRUE",
+        # Deleted-message updates only carry message IDs for private chats and groups
+        "CREATE INDEX IF NOT EXISTS idx_messages_user_message ON messages (user_id, message_id)",
+    ]),
+    (4, "Sender display name cache", [
+        '''
+        CREATE TABLE IF NOT EXISTS telegram_entities (
+            user_id INTEGER NOT NULL,
+            entity_id INTEGER NOT NULL,
+            display_name TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, entity_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+    ]),
+    (5, "Full-text index over stored messages", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            text,
+            content = 'messages',
+            content_rowid = 'rowid',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        # Keep the index in sync with the messages table
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF text ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+        END
+        ''',
+        "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+    ]),
+    (6, "Media kinds and on-disk media cache", [
+        "ALTER TABLE messages ADD COLUMN media_type TEXT",
+        # Cached files are stored once per content hash
+        '''
+        CREATE TABLE IF NOT EXISTS media_files (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mime_type TEXT NOT NULL,
+            last_access REAL NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_media_files_last_access ON media_files (last_access)",
+        '''
+        CREATE TABLE IF NOT EXISTS media_refs (
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            variant TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            PRIMARY KEY (user_id, chat_id, message_id, variant),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_media_refs_sha256 ON media_refs (sha256)",
+    ]),
+    (7, "Pending Telegram logins", [
+        # Code requests waiting for verification, so any worker can finish them
+        '''
+        CREATE TABLE IF NOT EXISTS pending_logins (
+            user_id INTEGER NOT NULL,
+            phone_number TEXT NOT NULL,
+            phone_code_hash TEXT NOT NULL,
+            session_string TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (user_id, phone_number),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_pending_logins_expires_at ON pending_logins (expires_at)",
+    ]),
+    (8, "State shared between workers", [
+        # Expiring values and leases; `wanted_by` marks a lease another worker waits for
+        '''
+        CREATE TABLE IF NOT EXISTS shared_state (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            owner TEXT,
+            wanted_by TEXT,
+            expires_at REAL NOT NULL
+        )
+        ''',
+    ]),
+    (9, "Chat list summaries", [
+        # Last message and unread count per dialog, kept current from update events
+        '''
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            type TEXT NOT NULL,
+            unread_count INTEGER NOT NULL DEFAULT 0,
+            last_message_id INTEGER,
+            last_message_text TEXT,
+            last_message_date TEXT,
+            last_message_from TEXT,
+            last_message_from_id INTEGER,
+            last_message_media_type TEXT,
+            PRIMARY KEY (user_id, chat_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_chat_summaries_recent ON chat_summaries (user_id, last_message_date DESC)",
+    ]),
+    (10, "Stable row IDs for the full-text index", [
+        # The implicit rowid of a table with a composite key may be renumbered by
+        # VACUUM, which silently desyncs an external-content index keyed on it.
+        # Rebuild messages with an INTEGER PRIMARY KEY alias and key the index on that.
+        "DROP TRIGGER IF EXISTS messages_fts_insert",
+        "DROP TRIGGER IF EXISTS messages_fts_delete",
+        "DROP TRIGGER IF EXISTS messages_fts_update",
+        "DROP TABLE IF EXISTS messages_fts",
+        '''
+        CREATE TABLE messages_new (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            date TEXT NOT NULL,
+            from_user TEXT,
+            from_user_id INTEGER,
+            media_type TEXT,
+            UNIQUE (user_id, chat_id, message_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        '''
+        INSERT INTO messages_new (user_id, chat_id, message_id, text, date, from_user, from_user_id, media_type)
+        SELECT user_id, chat_id, message_id, text, date, from_user, from_user_id, media_type FROM messages
+        ORDER BY user_id, chat_id, message_id
+        ''',
+        "DROP TABLE messages",
+        "ALTER TABLE messages_new RENAME TO messages",
+        "CREATE INDEX IF NOT EXISTS idx_messages_user_message ON messages (user_id, message_id)",
+        # user_id is stored unindexed so searches filter on it inside the index
+        '''
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            text,
+            user_id UNINDEXED,
+            content = 'messages',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, text, user_id) VALUES (new.id, new.text, new.user_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text, user_id) VALUES ('delete', old.id, old.text, old.user_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER messages_fts_update AFTER UPDATE OF text ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text, user_id) VALUES ('delete', old.id, old.text, old.user_id);
+            INSERT INTO messages_fts (rowid, text, user_id) VALUES (new.id, new.text, new.user_id);
+        END
+        ''',
+        "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+    ]),
+]
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """Apply pending schema migrations and return the resulting schema version"""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+
+        try:
+            # Take the write lock first so concurrent workers apply each migration once
+            conn.execute("BEGIN IMMEDIATE")
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version <= current:
+                conn.rollback()
+                continue
+
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        print(f"📦 Applied database migration {version}: {description}")
+        current = version
+
+    return current
+
+def init_database():
+    """Initialize the database schema by applying pending migrations"""
+    conn = sqlite3.connect(DATABASE_NAME)
+    try:
+        run_migrations(conn)
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+class ConnectionPool:
+    """Fixed-size pool of reusable SQLite connections shared between threads"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @property
+    def open(self) -> int:
+        return self._created
+
+    @property
+    def in_use(self) -> int:
+        return self._created - self._idle.qsize()
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        """Open a connection tuned for concurrent readers and a single writer"""
+        conn = sqlite3.connect(
+            DATABASE_NAME,
+            timeout=30,
+            check_same_thread=False,
+            cached_statements=256  # Prepared statements are reused per connection
+        )
+        conn.row_factory = sqlite3.Row  # Enable dict-like access
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, opening a new one while under the size limit"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        return self._idle.get()
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, discarding any unfinished transaction"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
 
-    conn.commit()
-    conn.close()
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+_pool = ConnectionPool(settings.DB_POOL_SIZE)
+_executor = ThreadPoolExecutor(max_workers=settings.DB_POOL_SIZE, thread_name_prefix="db")
+
+# Name of the DB call running on the current thread, used as the timing label
+_operation = threading.local()
+
+service_stats.register("db_pool", _pool, gauges=("open", "in_use"))
+service_stats.register("user_cache", _user_cache, counters=("hits", "misses"))
+service_stats.register("session_cache", _session_cache, counters=("hits", "misses"))
 
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row  # Enable dict-like access
+    """Context manager for pooled database connections"""
+    started = time.perf_counter()
+    conn = _pool.acquire()
+    acquired = time.perf_counter()
+    DB_WAIT_LATENCY.observe(acquired - started)
     try:
         yield conn
     finally:
-        conn.close()
+        _pool.release(conn)
+        DB_QUERY_LATENCY.labels(getattr(_operation, "name", "other")).observe(time.perf_counter() - acquired)
 
-def hash_password(password: str) -> str:
-    """Hash password using SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+def _run_named(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a DB call on an executor thread, labelling its connection timings"""
+    _operation.name = getattr(func, "__qualname__", "other")
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _operation.name = "other"
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking database call in the DB thread pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(_run_named, func, *args, **kwargs))
+
+def close_database():
+    """Close pooled connections (on application shutdown)"""
+    _pool.close()
 
 class UserDB:
     @staticmethod
-    def create_user(username: str, password: str) -> int:
-        """Create a new user and return user ID"""
-        password_hash = hash_password(password)
-        
+    def create_user(username: str, password_hash: str) -> int:
+        """Create a new user from an already hashed password and return user ID"""
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
@@ -66,22 +423,36 @@ class UserDB:
             return cursor.lastrowid
 
     @staticmethod
-    def get_user_by_credentials(username: str, password: str) -> Optional[Dict[str, Any]]:
-        """Get user by username and password"""
-        password_hash = hash_password(password)
-        
+    def get_user_with_password_hash(username: str) -> Optional[Dict[str, Any]]:
+        """Get user by username along with the stored password hash"""
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT id, username, created_at FROM users WHERE username = ? AND password_hash = ?",
-                (username, password_hash)
+                "SELECT id, username, created_at, password_hash FROM users WHERE username = ?",
+                (username,)
             )
             row = cursor.fetchone()
             return dict(row) if row else None
 
+    @staticmethod
+    def update_password_hash(user_id: int, old_hash: str, new_hash: str) -> bool:
+        """Replace a password hash unless it was changed concurrently"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                (new_hash, user_id, old_hash)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
     @staticmethod
     def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
         """Get user by ID"""
+        user = _user_cache.get(user_id, _MISSING)
+        if user is not _MISSING:
+            return user
+        
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
@@ -89,7 +460,12 @@ class UserDB:
                 (user_id,)
             )
             row = cursor.fetchone()
-            return dict(row) if row else None
+            user = dict(row) if row else None
+        
+        # Misses are not cached: the user may be registering through another worker
+        if user is not None:
+            _user_cache.set(user_id, user)
+        return user
 
     @staticmethod
     def username_exists(username: str) -> bool:
@@ -108,7 +484,7 @@ class TelegramDB:
 
             # Deactivate old sessions for this user
             cursor.execute(
-                "UPDATE telegram_sessions SET is_active = FALSE WHERE user_id = ?",
+                "UPDATE telegram_sessions SET is_active = FALSE WHERE user_id = ? AND is_active = TRUE",
                 (user_id,)
             )
             
@@ -119,11 +495,16 @@ class TelegramDB:
             )
             
             conn.commit()
+            _session_cache.invalidate(user_id)
             return cursor.lastrowid
     
     @staticmethod
     def get_active_session(user_id: int) -> Optional[Dict[str, Any]]:
         """Get active Telegram session for user"""
+        session = _session_cache.get(user_id, _MISSING)
+        if session is not _MISSING:
+            return session
+        
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
@@ -131,7 +512,10 @@ class TelegramDB:
                 (user_id,)
             )
             row = cursor.fetchone()
-            return dict(row) if row else None
+            session = dict(row) if row else None
+        
+        _session_cache.set(user_id, session)
+        return session
         
     @staticmethod
     def deactivate_sessions(user_id: int) -> bool:
@@ -139,12 +523,580 @@ class TelegramDB:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "UPDATE telegram_sessions SET is_active = FALSE WHERE user_id = ?",
+                "UPDATE telegram_sessions SET is_active = FALSE WHERE user_id = ? AND is_active = TRUE",
                 (user_id,)
             )
             conn.commit()
+            _session_cache.invalidate(user_id)
             return cursor.rowcount > 0
 
-# Initialize database on import
-init_database()
+    @staticmethod
+    def prune_inactive_sessions() -> int:
+        """Delete deactivated sessions and return how many were removed"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM telegram_sessions WHERE is_active = FALSE")
+            conn.commit()
+            return cursor.rowcount
+
+class PendingLoginDB:
+    @staticmethod
+    def save_pending_login(user_id: int, phone_number: str, phone_code_hash: str,
+                           session_string: str, expires_at: float, max_pending: int) -> bool:
+        """Store a code request unless `max_pending` unexpired requests of other logins exist"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT COUNT(*) FROM pending_logins
+                   WHERE expires_at > ? AND NOT (user_id = ? AND phone_number = ?)""",
+                (time.time(), user_id, phone_number)
+            )
+            if cursor.fetchone()[0] >= max_pending:
+                return False
 
+            cursor.execute(
+                """INSERT INTO pending_logins (user_id, phone_number, phone_code_hash, session_string, expires_at)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (user_id, phone_number) DO UPDATE SET
+                       phone_code_hash = excluded.phone_code_hash,
+                       session_string = excluded.session_string,
+                       expires_at = excluded.expires_at""",
+                (user_id, phone_number, phone_code_hash, session_string, expires_at)
+            )
+            conn.commit()
+            return True
+
+    @staticmethod
+    def get_pending_login(user_id: int, phone_number: str) -> Optional[Dict[str, Any]]:
+        """Get an unexpired code request"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT phone_code_hash, session_string, expires_at FROM pending_logins
+                   WHERE user_id = ? AND phone_number = ? AND expires_at > ?""",
+                (user_id, phone_number, time.time())
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    @staticmethod
+    def delete_pending_login(user_id: int, phone_number: str) -> None:
+        """Forget a code request (verified or abandoned)"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM pending_logins WHERE user_id = ? AND phone_number = ?",
+                (user_id, phone_number)
+            )
+            conn.commit()
+
+    @staticmethod
+    def delete_expired_logins() -> int:
+        """Delete expired code requests and return how many were removed"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM pending_logins WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+            return cursor.rowcount
+
+class SharedStateDB:
+    @staticmethod
+    def get_value(key: str) -> Optional[str]:
+        """Get an unexpired shared value"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM shared_state WHERE key = ? AND expires_at > ?", (key, time.time()))
+            row = cursor.fetchone()
+            return row["value"] if row else None
+
+    @staticmethod
+    def set_value(key: str, value: str, ttl: float) -> None:
+        """Store a shared value for `ttl` seconds"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)
+                   ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at""",
+                (key, value, time.time() + ttl)
+            )
+            conn.commit()
+
+    @staticmethod
+    def acquire_lease(key: str, owner: str, ttl: float) -> bool:
+        """Take or extend a lease unless another owner holds it unexpired"""
+        now = time.time()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO shared_state (key, owner, expires_at) VALUES (?, ?, ?)
+                   ON CONFLICT (key) DO UPDATE SET
+                       owner = excluded.owner,
+                       expires_at = excluded.expires_at
+                   WHERE owner = excluded.owner OR expires_at <= ?""",
+                (key, owner, now + ttl, now)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def get_lease_owner(key: str) -> Optional[str]:
+        """Get the owner of an unexpired lease"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT owner FROM shared_state WHERE key = ? AND expires_at > ?", (key, time.time()))
+            row = cursor.fetchone()
+            return row["owner"] if row else None
+
+    @staticmethod
+    def renew_leases(keys: List[str], owner: str, ttl: float) -> Set[str]:
+        """Extend the owner's leases, returning the ones still held"""
+        if not keys:
+            return set()
+
+        placeholders = ", ".join("?" for _ in keys)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE shared_state SET expires_at = ? WHERE owner = ? AND key IN ({placeholders})",
+                (time.time() + ttl, owner, *keys)
+            )
+            cursor.execute(
+                f"SELECT key FROM shared_state WHERE owner = ? AND key IN ({placeholders})",
+                (owner, *keys)
+            )
+            held = {row["key"] for row in cursor.fetchall()}
+            conn.commit()
+            return held
+
+    @staticmethod
+    def release_lease(key: str, owner: str) -> None:
+        """Give up a lease held by the owner"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM shared_state WHERE key = ? AND owner = ?", (key, owner))
+            conn.commit()
+
+    @staticmethod
+    def delete_expired_state() -> int:
+        """Delete expired values and leases"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+            return cursor.rowcount
+
+class MessageDB:
+    @staticmethod
+    def get_sync_state(user_id: int, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Get the stored message range for a chat"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT oldest_id, newest_id, history_complete,
+                          (julianday('now') - julianday(synced_at)) * 86400 AS synced_age
+                   FROM message_sync_state WHERE user_id = ? AND chat_id = ?""",
+                (user_id, chat_id)
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    @staticmethod
+    def save_messages(user_id: int, chat_id: int, messages: List[Dict[str, Any]],
+                      oldest_id: int, newest_id: int, history_complete: bool, newest_synced: bool = True) -> None:
+        """Upsert messages and update the chat's stored range in one transaction
+
+        `newest_synced` marks the newest end as checked against Telegram just now.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                """INSERT INTO messages (user_id, chat_id, message_id, text, date, from_user, from_user_id, media_type)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (user_id, chat_id, message_id) DO UPDATE SET
+                       text = excluded.text,
+                       date = excluded.date,
+                       from_user = excluded.from_user,
+                       from_user_id = excluded.from_user_id,
+                       media_type = excluded.media_type""",
+                [
+                    (user_id, chat_id, m["id"], m["text"], m["date"], m["from_user"], m["from_user_id"],
+                     m.get("media_type"))
+                    for m in messages
+                ]
+            )
+            cursor.execute(
+                """INSERT INTO message_sync_state (user_id, chat_id, oldest_id, newest_id, history_complete)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (user_id, chat_id) DO UPDATE SET
+                       oldest_id = excluded.oldest_id,
+                       newest_id = excluded.newest_id,
+                       history_complete = excluded.history_complete,
+                       synced_at = CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE synced_at END""",
+                (user_id, chat_id, oldest_id, newest_id, history_complete, newest_synced)
+            )
+            conn.commit()
+
+    @staticmethod
+    def get_messages(user_id: int, chat_id: int, limit: int,
+                     before_id: Optional[int] = None, after_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get stored messages of a chat between the cursors, newest first
+
+        With `after_id` the page starts right after the cursor (oldest first in SQL),
+        otherwise it ends right before `before_id` or at the newest message.
+        """
+        order = "ASC" if after_id is not None else "DESC"
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT message_id AS id, text, date, from_user, from_user_id, media_type FROM messages
+                    WHERE user_id = ? AND chat_id = ? AND message_id < ? AND message_id > ?
+                    ORDER BY message_id {order} LIMIT ?""",
+                (
+                    user_id, chat_id,
+                    before_id if before_id is not None else 2 ** 63 - 1,
+                    after_id if after_id is not None else 0,
+                    limit
+                )
+            )
+            rows = [dict(row) for row in cursor.fetchall()]
+            if after_id is not None:
+                rows.reverse()
+            return rows
+
+    @staticmethod
+    def search(user_id: int, match: str, chat_id: Optional[int] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Full-text search over stored messages, best matches first"""
+        chat_filter = "AND m.chat_id = ?" if chat_id is not None else ""
+        params = (match, user_id, chat_id, limit) if chat_id is not None else (match, user_id, limit)
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT m.chat_id, m.message_id AS id, m.text, m.date, m.from_user, m.from_user_id, m.media_type,
+                           snippet(messages_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet
+                    FROM messages_fts
+                    JOIN messages m ON m.id = messages_fts.rowid
+                    WHERE messages_fts MATCH ? AND messages_fts.user_id = ? {chat_filter}
+                    ORDER BY bm25(messages_fts)
+                    LIMIT ?""",
+                params
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def update_message(user_id: int, chat_id: int, message: Dict[str, Any]) -> bool:
+        """Update an already stored message (e.g. after an edit)"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """UPDATE messages SET text = ?, from_user = ?, from_user_id = ?, media_type = ?
+                   WHERE user_id = ? AND chat_id = ? AND message_id = ?""",
+                (message["text"], message["from_user"], message["from_user_id"], message.get("media_type"),
+                 user_id, chat_id, message["id"])
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def delete_messages(user_id: int, message_ids: List[int], chat_id: Optional[int] = None) -> int:
+        """Delete stored messages; without chat_id the IDs are matched across all chats"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            if chat_id is None:
+                cursor.executemany(
+                    "DELETE FROM messages WHERE user_id = ? AND message_id = ?",
+                    [(user_id, message_id) for message_id in message_ids]
+                )
+            else:
+                cursor.executemany(
+                    "DELETE FROM messages WHERE user_id = ? AND chat_id = ? AND message_id = ?",
+                    [(user_id, chat_id, message_id) for message_id in message_ids]
+                )
+            conn.commit()
+            return cursor.rowcount
+
+    @staticmethod
+    def clear_chat(user_id: int, chat_id: int) -> None:
+        """Forget all stored messages of a chat"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM messages WHERE user_id = ? AND chat_id = ?", (user_id, chat_id))
+            cursor.execute("DELETE FROM message_sync_state WHERE user_id = ? AND chat_id = ?", (user_id, chat_id))
+            conn.commit()
+
+    @staticmethod
+    def clear_user(user_id: int) -> None:
+        """Forget all stored messages of a user"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM messages WHERE user_id = ?", (user_id,))
+            cursor.execute("DELETE FROM message_sync_state WHERE user_id = ?", (user_id,))
+            conn.commit()
+
+class ChatSummaryDB:
+    @staticmethod
+    def _message_columns(message: Optional[Dict[str, Any]]) -> tuple:
+        """Flatten an API message into the last_message_* columns"""
+        if not message:
+            return (None, None, None, None, None, None)
+        return (message["id"], message["text"], message["date"], message["from_user"],
+                message["from_user_id"], message.get("media_type"))
+
+    @staticmethod
+    def replace_summaries(user_id: int, chats: List[Dict[str, Any]]) -> None:
+        """Replace the user's chat summaries with a freshly loaded dialog list"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM chat_summaries WHERE user_id = ?", (user_id,))
+            cursor.executemany(
+                """INSERT INTO chat_summaries (user_id, chat_id, title, type, unread_count, last_message_id,
+                       last_message_text, last_message_date, last_message_from, last_message_from_id,
+                       last_message_media_type)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (user_id, chat["id"], chat["title"], chat["type"], chat["unread_count"] or 0,
+                     *ChatSummaryDB._message_columns(chat.get("last_message")))
+                    for chat in chats
+                ]
+            )
+            conn.commit()
+
+    @staticmethod
+    def get_summaries(user_id: int) -> List[Dict[str, Any]]:
+        """Get the user's chat summaries, most recently active first"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT chat_id, title, type, unread_count, last_message_id, last_message_text,
+                          last_message_date, last_message_from, last_message_from_id, last_message_media_type
+                   FROM chat_summaries WHERE user_id = ?
+                   ORDER BY last_message_date IS NULL, last_message_date DESC""",
+                (user_id,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def apply_new_message(user_id: int, chat_id: int, message: Dict[str, Any], unread_increment: int) -> bool:
+        """Make a new message the chat's last one, ignoring messages older than the stored one"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """UPDATE chat_summaries SET
+                       unread_count = unread_count + ?,
+                       last_message_id = ?, last_message_text = ?, last_message_date = ?,
+                       last_message_from = ?, last_message_from_id = ?, last_message_media_type = ?
+                   WHERE user_id = ? AND chat_id = ? AND (last_message_id IS NULL OR last_message_id < ?)""",
+                (unread_increment, *ChatSummaryDB._message_columns(message), user_id, chat_id, message["id"])
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def apply_edit(user_id: int, chat_id: int, message: Dict[str, Any]) -> bool:
+        """Update the chat's last message if it is the edited one"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """UPDATE chat_summaries SET
+                       last_message_text = ?, last_message_from = ?, last_message_from_id = ?,
+                       last_message_media_type = ?
+                   WHERE user_id = ? AND chat_id = ? AND last_message_id = ?""",
+                (message["text"], message["from_user"], message["from_user_id"], message.get("media_type"),
+                 user_id, chat_id, message["id"])
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    @staticmethod
+    def apply_delete(user_id: int, message_ids: List[int], chat_id: Optional[int] = None) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Replace deleted last messages with the newest stored message still left
+
+        Call after the messages were deleted. Without chat_id every chat whose
+        last message has one of the IDs is affected. Returns the new last
+        message (None if the store holds none) of each affected chat.
+        """
+        placeholders = ",".join("?" * len(message_ids))
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            query = f"SELECT chat_id FROM chat_summaries WHERE user_id = ? AND last_message_id IN ({placeholders})"
+            params = [user_id, *message_ids]
+            if chat_id is not None:
+                query += " AND chat_id = ?"
+                params.append(chat_id)
+            cursor.execute(query, params)
+            chat_ids = [row["chat_id"] for row in cursor.fetchall()]
+
+            last_messages = {}
+            for affected_chat_id in chat_ids:
+                cursor.execute(
+                    """SELECT message_id AS id, text, date, from_user, from_user_id, media_type
+                       FROM messages WHERE user_id = ? AND chat_id = ?
+                       ORDER BY message_id DESC LIMIT 1""",
+                    (user_id, affected_chat_id)
+                )
+                row = cursor.fetchone()
+                message = dict(row) if row else None
+                cursor.execute(
+                    """UPDATE chat_summaries SET
+                           last_message_id = ?, last_message_text = ?, last_message_date = ?,
+                           last_message_from = ?, last_message_from_id = ?, last_message_media_type = ?
+                       WHERE user_id = ? AND chat_id = ?""",
+                    (*ChatSummaryDB._message_columns(message), user_id, affected_chat_id)
+                )
+                last_messages[affected_chat_id] = message
+            conn.commit()
+            return last_messages
+
+    @staticmethod
+    def mark_read(user_id: int, chat_id: int, max_id: int) -> bool:
+        """Apply a read receipt, returning False if unread messages may remain after max_id
+
+        Reading up to the last message resets the unread count. A partial read
+        leaves it alone: the caller has to recount it with Telegram.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """UPDATE chat_summaries SET unread_count = 0
+                   WHERE user_id = ? AND chat_id = ? AND unread_count > 0 AND last_message_id <= ?""",
+                (user_id, chat_id, max_id)
+            )
+            cursor.execute(
+                """SELECT 1 FROM chat_summaries
+                   WHERE user_id = ? AND chat_id = ? AND unread_count > 0 AND last_message_id > ?""",
+                (user_id, chat_id, max_id)
+            )
+            partial = cursor.fetchone() is not None
+            conn.commit()
+            return not partial
+
+    @staticmethod
+    def set_unread_count(user_id: int, chat_id: int, unread_count: int) -> None:
+        """Store an unread count reported by Telegram"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE chat_summaries SET unread_count = ? WHERE user_id = ? AND chat_id = ?",
+                (unread_count, user_id, chat_id)
+            )
+            conn.commit()
+
+    @staticmethod
+    def clear_user(user_id: int) -> None:
+        """Forget all chat summaries of a user"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM chat_summaries WHERE user_id = ?", (user_id,))
+            conn.commit()
+
+class EntityDB:
+    @staticmethod
+    def get_display_names(user_id: int, entity_ids: List[int], max_age: int) -> Dict[int, str]:
+        """Get stored display names that are younger than `max_age` seconds"""
+        if not entity_ids:
+            return {}
+        
+        placeholders = ", ".join("?" for _ in entity_ids)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT entity_id, display_name FROM telegram_entities
+                    WHERE user_id = ? AND entity_id IN ({placeholders})
+                    AND updated_at > datetime('now', ?)""",
+                (user_id, *entity_ids, f"-{max_age} seconds")
+            )
+            return {row["entity_id"]: row["display_name"] for row in cursor.fetchall()}
+
+    @staticmethod
+    def save_display_names(user_id: int, names: Dict[int, str]) -> None:
+        """Store or refresh display names"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                """INSERT INTO telegram_entities (user_id, entity_id, display_name) VALUES (?, ?, ?)
+                   ON CONFLICT (user_id, entity_id) DO UPDATE SET
+                       display_name = excluded.display_name,
+                       updated_at = CURRENT_TIMESTAMP""",
+                [(user_id, entity_id, name) for entity_id, name in names.items()]
+            )
+            conn.commit()
+
+    @staticmethod
+    def clear_user(user_id: int) -> None:
+        """Forget all stored display names of a user"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM telegram_entities WHERE user_id = ?", (user_id,))
+            conn.commit()
+
+class MediaDB:
+    @staticmethod
+    def get_media(user_id: int, chat_id: int, message_id: int, variant: str) -> Optional[Dict[str, Any]]:
+        """Get the cached file of a message's media and mark it as recently used"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT f.sha256, f.size, f.mime_type FROM media_refs r
+                   JOIN media_files f ON f.sha256 = r.sha256
+                   WHERE r.user_id = ? AND r.chat_id = ? AND r.message_id = ? AND r.variant = ?""",
+                (user_id, chat_id, message_id, variant)
+            )
+            row = cursor.fetchone()
+            if row:
+                cursor.execute("UPDATE media_files SET last_access = ? WHERE sha256 = ?", (time.time(), row["sha256"]))
+                conn.commit()
+            return dict(row) if row else None
+
+    @staticmethod
+    def save_media(user_id: int, chat_id: int, message_id: int, variant: str,
+                   sha256: str, size: int, mime_type: str) -> None:
+        """Register a cached file and point the message's media at it"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO media_files (sha256, size, mime_type, last_access) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (sha256) DO UPDATE SET last_access = excluded.last_access""",
+                (sha256, size, mime_type, time.time())
+            )
+            cursor.execute(
+                """INSERT INTO media_refs (user_id, chat_id, message_id, variant, sha256) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (user_id, chat_id, message_id, variant) DO UPDATE SET sha256 = excluded.sha256""",
+                (user_id, chat_id, message_id, variant, sha256)
+            )
+            conn.commit()
+
+    @staticmethod
+    def evict_media(max_bytes: int, keep: Optional[str] = None) -> List[str]:
+        """Forget least recently used files until the cache fits, returning their hashes
+
+        The file `keep` is never evicted, even if it alone exceeds the limit.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(SUM(size), 0) FROM media_files")
+            total = cursor.fetchone()[0]
+            if total <= max_bytes:
+                return []
+
+            evicted = []
+            cursor.execute(
+                "SELECT sha256, size FROM media_files WHERE sha256 IS NOT ? ORDER BY last_access", (keep,)
+            )
+            for row in cursor.fetchall():
+                if total <= max_bytes:
+                    break
+                evicted.append(row["sha256"])
+                total -= row["size"]
+
+            cursor.executemany("DELETE FROM media_refs WHERE sha256 = ?", [(sha,) for sha in evicted])
+            cursor.executemany("DELETE FROM media_files WHERE sha256 = ?", [(sha,) for sha in evicted])
+            conn.commit()
+            return evicted
+
+    @staticmethod
+    def clear_user(user_id: int) -> None:
+        """Forget which cached files belong to a user's messages"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM media_refs WHERE user_id = ?", (user_id,))
+            conn.commit()
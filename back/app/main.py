@@ -1,51 +1,21 @@
-import os
-from pathlib import Path
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-try:
-    from dotenv import load_dotenv
-    
-    env_path = Path(__file__).parent / '.env'
-    print(f"🔍 Шукаємо .env файл за адресою: {env_path}")
-    print(f"🔍 Файл існує: {env_path.exists()}")
-    
-    if env_path.exists():
-        result = load_dotenv(env_path)
-        print(f"📁 Результат завантаження .env: {result}")
-        
-        with open(env_path, 'r') as f:
-            content = f.read()
-            print(f"📄 Вміст .env файлу:")
-            print(content)
-    else:
-        print("❌ .env файл не знайдено!")
-        
-except ImportError:
-    print("❌ python-dotenv не встановлено! Встановіть: pip install python-dotenv")
-
-print("\n🔧 Перевірка змінних середовища:")
-print(f"TELEGRAM_API_ID: {os.getenv('TELEGRAM_API_ID', 'НЕ ЗНАЙДЕНО')}")
-print(f"TELEGRAM_API_HASH: {os.getenv('TELEGRAM_API_HASH', 'НЕ ЗНАЙДЕНО')}")
-print(f"JWT_SECRET: {os.getenv('JWT_SECRET', 'НЕ ЗНАЙДЕНО')}")
-print(f"DEBUG: {os.getenv('DEBUG', 'НЕ ЗНАЙДЕНО')}")
-
 from .routers import auth, telegram
-from .database import init_database
+from .database import init_database, close_database, run_db, TelegramDB
 from .config import settings, validate_config
+from .metrics import MetricsMiddleware, render_metrics
+from .services.client_pool import client_pool
+from .services.pending_logins import pending_logins
+from .services.sync_worker import sync_workers
+from .worker_proxy import WorkerRoutingMiddleware, worker_proxy
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print(f"🚀 Starting {settings.APP_NAME} v{settings.VERSION}...")
     
-    print(f"🔧 Налаштування:")
-    print(f"   - TELEGRAM_API_ID: {settings.TELEGRAM_API_ID}")
-    print(f"   - TELEGRAM_API_HASH: {'*' * len(settings.TELEGRAM_API_HASH) if settings.TELEGRAM_API_HASH else 'НЕ ВСТАНОВЛЕНО'}")
-    print(f"   - JWT_SECRET: {'*' * 20 if settings.JWT_SECRET != 'your-secret-key-change-in-production' else 'ДЕФОЛТНИЙ!'}")
-    print(f"   - telegram_configured: {settings.telegram_configured}")
-    
     # Validate configuration
     config_valid = validate_config()
     if not config_valid and not settings.DEBUG:
@@ -54,11 +24,30 @@ async def lifespan(app: FastAPI):
     
     # Initialize database
     init_database()
-    print("✅ Database initialized")
+    pruned = await run_db(TelegramDB.prune_inactive_sessions)
+    print(f"✅ Database initialized (pruned {pruned} inactive sessions)")
+    
+    # Start Telegram client pool
+    await client_pool.start()
+    
+    # Accept requests other workers forward for accounts this one holds
+    await worker_proxy.start(app)
+    
+    # Start expiring abandoned code requests
+    await pending_logins.start()
+    
+    # Start background sync workers
+    if settings.SYNC_ENABLED:
+        await sync_workers.start()
     
     yield
     # Shutdown
     print("🛑 Shutting down...")
+    await worker_proxy.close()
+    await sync_workers.close()
+    await pending_logins.close()
+    await client_pool.close()
+    close_database()
 
 # Create FastAPI app
 app = FastAPI(
@@ -77,6 +66,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, exported at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Outermost: Telegram requests of accounts held by another worker are relayed there
+app.add_middleware(WorkerRoutingMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(telegram.router, prefix="/api")
@@ -102,6 +97,12 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    body, content_type = render_metrics(await worker_proxy.peer_stats())
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,133 @@
+import os
+import time
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Set by run.py for several workers: histograms are then kept in per-process
+# files in this directory and merged at scrape time
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# (name, kind, description, value) of one service stat
+Stat = Tuple[str, str, str, float]
+
+# Sub-millisecond resolution for SQLite, up to the request deadline for Telegram
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+TELEGRAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response starts",
+    ["method", "route", "status"]
+)
+TELEGRAM_LATENCY = Histogram(
+    "telegram_call_duration_seconds", "Latency of outbound Telegram calls",
+    ["operation"], buckets=TELEGRAM_BUCKETS
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Time a pooled SQLite connection is held",
+    ["operation"], buckets=DB_BUCKETS
+)
+DB_WAIT_LATENCY = Histogram(
+    "db_connection_wait_seconds", "Time spent waiting for a pooled SQLite connection",
+    buckets=DB_BUCKETS
+)
+
+class _StatsCollector:
+    """Expose counters and gauges that services already keep as plain attributes
+
+    Values are read at scrape time, so the hot paths only bump integers.
+    """
+
+    def __init__(self):
+        self._sources: List[Tuple[str, Any, Sequence[str], Sequence[str]]] = []
+
+    def register(self, component: str, source: Any, counters: Sequence[str] = (), gauges: Sequence[str] = ()):
+        """Publish `source.<attr>` as `<component>_<attr>` metrics"""
+        self._sources.append((component, source, counters, gauges))
+
+    def snapshot(self) -> List[Stat]:
+        """Read the current value of every published attribute"""
+        stats = []
+        for component, source, counters, gauges in self._sources:
+            for kind, attrs in (("counter", counters), ("gauge", gauges)):
+                for attr in attrs:
+                    stats.append((
+                        f"{component}_{attr}", kind, f"{component} {attr.replace('_', ' ')}", getattr(source, attr)
+                    ))
+        return stats
+
+    def collect(self):
+        return _stat_families([self.snapshot()])
+
+def _stat_families(snapshots: Iterable[Sequence[Stat]]):
+    """Build metric families from snapshots of one or more processes, summing their values"""
+    totals: Dict[str, list] = {}
+    for snapshot in snapshots:
+        for name, kind, documentation, value in snapshot:
+            total = totals.setdefault(name, [kind, documentation, 0])
+            total[2] += value
+
+    for name, (kind, documentation, value) in totals.items():
+        family = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+        yield family(name, documentation, value=value)
+
+class _SummedStats:
+    """Collector for service stats gathered from every worker"""
+
+    def __init__(self, snapshots: List[Sequence[Stat]]):
+        self.snapshots = snapshots
+
+    def collect(self):
+        return _stat_families(self.snapshots)
+
+service_stats = _StatsCollector()
+REGISTRY.register(service_stats)
+
+def render_metrics(peer_stats: Sequence[Sequence[Stat]] = ()) -> Tuple[bytes, str]:
+    """Render every registered metric in the Prometheus text format
+
+    With several workers, histograms come from all processes' files and the
+    service stats of this worker are summed with `peer_stats` of the others.
+    """
+    if MULTIPROCESS_DIR is None:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=MULTIPROCESS_DIR)
+    registry.register(_SummedStats([service_stats.snapshot(), *peer_stats]))
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        responded = False
+
+        def observe(status_code: int):
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], route.path if route else "unmatched", str(status_code)
+            ).observe(time.perf_counter() - started)
+
+        async def send_with_status(message):
+            nonlocal responded
+            # Streaming responses are measured until their headers go out
+            if message["type"] == "http.response.start":
+                responded = True
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            if not responded:
+                observe(500)
+            raise
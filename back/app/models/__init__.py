@@ -8,8 +8,15 @@ from .telegram import (
     TelegramVerify, 
     ChatInfo, 
     MessageInfo, 
+    DialogOffset,
+    DialogPage,
+    MessagePage,
+    MessageBatchRequest,
+    ChatMessagesResult,
+    SearchResult,
     TelegramStatus,
-    ConnectResponse
+    ConnectResponse,
+    UpdatesToken
 )
 
 __all__ = [
@@ -21,6 +28,13 @@ __all__ = [
     "TelegramVerify", 
     "ChatInfo",
     "MessageInfo",
+    "DialogOffset",
+    "DialogPage",
+    "MessagePage",
+    "MessageBatchRequest",
+    "ChatMessagesResult",
+    "SearchResult",
     "TelegramStatus",
-    "ConnectResponse"
+    "ConnectResponse",
+    "UpdatesToken"
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class TelegramConnect(BaseModel):
@@ -17,18 +17,49 @@ class TelegramSession(BaseModel):
     is_active: bool
     created_at: datetime
 
-class ChatInfo(BaseModel):
-    id: int
-    title: str
-    type: str
-    unread_count: Optional[int] = 0
-
 class MessageInfo(BaseModel):
     id: int
     text: str
     date: datetime
     from_user: Optional[str] = None
     from_user_id: Optional[int] = None
+    media_type: Optional[str] = None
+
+class ChatInfo(BaseModel):
+    id: int
+    title: str
+    type: str
+    unread_count: Optional[int] = 0
+    last_message: Optional[MessageInfo] = None
+
+class DialogOffset(BaseModel):
+    offset_date: Optional[datetime] = None
+    offset_id: int = 0
+    offset_peer: Optional[int] = None
+
+class DialogPage(BaseModel):
+    dialogs: List[ChatInfo]
+    next_offset: Optional[DialogOffset] = None
+
+class SearchResult(MessageInfo):
+    chat_id: int
+    snippet: str
+
+class MessagePage(BaseModel):
+    messages: List[MessageInfo]
+    next_before_id: Optional[int] = None
+    next_after_id: Optional[int] = None
+
+class ChatMessagesRequest(BaseModel):
+    chat_id: int
+    limit: int = Field(default=20, ge=1, le=100)
+
+class MessageBatchRequest(BaseModel):
+    chats: List[ChatMessagesRequest] = Field(min_length=1, max_length=50)
+
+class ChatMessagesResult(BaseModel):
+    messages: List[MessageInfo] = []
+    error: Optional[str] = None
 
 class TelegramStatus(BaseModel):
     connected: bool
@@ -37,4 +68,7 @@ class TelegramStatus(BaseModel):
 class ConnectResponse(BaseModel):
     message: str
     requires_code: bool = False
-    requires_password: bool = False
\ No newline at end of file
+    requires_password: bool = False
+class UpdatesToken(BaseModel):
+    token: str
+    expires_in: int
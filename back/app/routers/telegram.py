@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, Query
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Dict, List, Literal, Optional
 from ..models.telegram import (
     TelegramConnect, 
     TelegramVerify, 
     ChatInfo, 
-    MessageInfo, 
+    DialogPage,
+    MessagePage,
+    MessageBatchRequest,
+    ChatMessagesResult,
+    SearchResult,
     TelegramStatus,
-    ConnectResponse
+    ConnectResponse,
+    UpdatesToken
 )
-from ..services.auth_service import get_current_user_id
+from ..config import settings
+from ..services.auth_service import AuthService, get_current_user_id, get_updates_user_id
 from ..services.telegram_service import TelegramService
+from ..services.media_cache import media_cache
+from ..services.update_stream import update_broker
+from ..services.sync_worker import get_active_user_id
 
 router = APIRouter(prefix="/telegram", tags=["Telegram"])
 
@@ -34,26 +46,169 @@ async def verify_code(
         verify_data.password
     )
 
+# Message endpoints return ORJSONResponse directly: their rows already have the
+# response model's shape (dates as ISO strings), so per-message validation and
+# re-serialization are skipped. The response models only document the schema.
+
+# Per-user JSON that clients may keep but must revalidate with If-None-Match
+REVALIDATE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an entity tag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
 @router.get("/chats", response_model=List[ChatInfo])
-async def get_chats(user_id: int = Depends(get_current_user_id)):
+async def get_chats(request: Request, response: Response, user_id: int = Depends(get_active_user_id)):
     """Get list of user's Telegram chats"""
-    return await TelegramService.get_chats(user_id)
+    chats = await TelegramService.get_chats(user_id)
+    headers = {"ETag": TelegramService.chats_etag(user_id, chats), **REVALIDATE_HEADERS}
+
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return chats
+
+@router.get("/chats/summary", response_model=List[ChatInfo])
+async def get_chat_summaries(request: Request, user_id: int = Depends(get_active_user_id)):
+    """Get the chat list with last messages and unread counts, for rendering the sidebar"""
+    chats = await TelegramService.get_chat_summaries(user_id)
+    headers = {"ETag": TelegramService.chats_etag(user_id, chats), **REVALIDATE_HEADERS}
+
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return ORJSONResponse(chats, headers=headers)
 
-@router.get("/messages/{chat_id}", response_model=List[MessageInfo])
+@router.get("/dialogs", response_model=DialogPage)
+async def get_dialogs(
+    limit: int = Query(default=50, le=100, ge=1),
+    offset_date: Optional[datetime] = Query(default=None, description="next_offset.offset_date of the previous page"),
+    offset_id: int = Query(default=0, ge=0, description="next_offset.offset_id of the previous page"),
+    offset_peer: Optional[int] = Query(default=None, description="next_offset.offset_peer of the previous page"),
+    folder: int = Query(default=0, ge=0, le=1, description="Peer folder: 0 for the main list, 1 for the archive"),
+    archived: bool = Query(default=False, description="Shorthand for folder=1"),
+    chat_type: Optional[Literal["user", "group", "channel"]] = Query(
+        default=None, alias="type", description="Only list chats of this type"
+    ),
+    sort: Literal["recent", "title", "unread"] = Query(default="recent"),
+    user_id: int = Depends(get_active_user_id)
+):
+    """Page through all dialogs of a folder, following next_offset"""
+    return ORJSONResponse(await TelegramService.get_dialogs(
+        user_id, limit, offset_date, offset_id, offset_peer,
+        1 if archived else folder, chat_type, sort
+    ))
+
+@router.post("/messages/batch", response_model=Dict[int, ChatMessagesResult])
+async def get_messages_batch(
+    batch: MessageBatchRequest,
+    user_id: int = Depends(get_active_user_id)
+):
+    """Get the newest messages of several chats in one request"""
+    return ORJSONResponse(await TelegramService.get_messages_batch(
+        user_id,
+        [(chat.chat_id, chat.limit) for chat in batch.chats]
+    ))
+
+@router.get("/messages/{chat_id}", response_model=MessagePage)
 async def get_messages(
     chat_id: int,
+    request: Request,
     limit: int = Query(default=50, le=100, ge=1),
+    before_id: Optional[int] = Query(default=None, ge=1, description="Return messages older than this ID"),
+    after_id: Optional[int] = Query(default=None, ge=0, description="Return messages newer than this ID"),
+    user_id: int = Depends(get_active_user_id)
+):
+    """Get a page of messages from a specific chat"""
+    page = await TelegramService.get_messages(user_id, chat_id, limit, before_id, after_id)
+    headers = {"ETag": TelegramService.messages_etag(page), **REVALIDATE_HEADERS}
+
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return ORJSONResponse(page, headers=headers)
+
+@router.get("/search", response_model=List[SearchResult])
+async def search_messages(
+    q: str = Query(min_length=1, max_length=200, description="Words to search for"),
+    chat_id: Optional[int] = Query(default=None, description="Limit the search to one chat"),
+    limit: int = Query(default=20, le=100, ge=1),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Search messages that were already synced to the local store"""
+    return ORJSONResponse(await TelegramService.search_messages(user_id, q, chat_id, limit))
+
+@router.get("/export/{chat_id}")
+async def export_chat(
+    chat_id: int,
+    format: Literal["ndjson", "csv"] = Query(default="ndjson"),
+    after_id: int = Query(default=0, ge=0, description="Resume after this message ID"),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Stream the whole history of a chat, oldest message first"""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        await TelegramService.open_export(user_id, chat_id, format, after_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="chat_{chat_id}.{format}"'}
+    )
+
+@router.get("/media/{chat_id}/{message_id}")
+async def get_media(
+    chat_id: int,
+    message_id: int,
+    request: Request,
+    thumb: bool = Query(default=False, description="Return the largest thumbnail instead of the file"),
     user_id: int = Depends(get_current_user_id)
 ):
-    """Get messages from a specific chat"""
-    return await TelegramService.get_messages(user_id, chat_id, limit)
+    """Serve a message's media from the local cache, downloading it on first access"""
+    media = await media_cache.get(user_id, chat_id, message_id, thumb)
+    headers = {
+        "ETag": f'"{media["sha256"]}"',
+        "Cache-Control": f"private, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    }
+
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse answers Range requests with 206 partial content
+    return FileResponse(media["path"], media_type=media["mime_type"], headers=headers)
+
+@router.post("/updates/token", response_model=UpdatesToken)
+async def create_updates_token(user_id: int = Depends(get_current_user_id)):
+    """Issue a short-lived token for opening the update stream with EventSource"""
+    return {
+        "token": AuthService.create_updates_token(user_id),
+        "expires_in": settings.UPDATE_TOKEN_EXPIRE_SECONDS
+    }
+
+@router.get("/updates")
+async def stream_updates(user_id: int = Depends(get_updates_user_id)):
+    """Stream new, edited and deleted messages as Server-Sent Events
+
+    Authenticated by the `token` query parameter, since EventSource cannot
+    send an Authorization header.
+    """
+    stream = await update_broker.open_stream(user_id)
+    # Also runs when the client disconnects before the body was iterated
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(stream.aclose)
+    )
 
 @router.post("/disconnect")
 async def disconnect_telegram(user_id: int = Depends(get_current_user_id)):
     """Disconnect Telegram account"""
-    return TelegramService.disconnect_user(user_id)
+    return await TelegramService.disconnect_user(user_id)
 
 @router.get("/status", response_model=TelegramStatus)
 async def get_telegram_status(user_id: int = Depends(get_current_user_id)):
     """Get Telegram connection status"""
-    return TelegramService.get_status(user_id)
\ No newline at end of file
+    return await TelegramService.get_status(user_id)
\ No newline at end of file
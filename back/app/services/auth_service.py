@@ -1,14 +1,25 @@
 import jwt
+import time
 from datetime import datetime, timedelta
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 
-from ..database import UserDB
+from ..database import UserDB, run_db
 from ..config import settings
+from ..cache import TTLCache
+from ..metrics import service_stats
+from ..passwords import password_hasher
 
 security = HTTPBearer()
 
+# Scope of the short-lived tokens that authenticate the update stream
+UPDATES_SCOPE = "updates"
+
+# Verified (scope, token) pairs mapped to user IDs, never kept past the token's own expiry
+_token_cache = TTLCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+service_stats.register("token_cache", _token_cache, counters=("hits", "misses"))
+
 class AuthService:
     @staticmethod
     def create_access_token(user_id: int) -> str:
@@ -22,18 +33,42 @@ class AuthService:
         return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
     @staticmethod
-    def verify_token(token: str) -> int:
-        """Verify JWT token and return user ID"""
+    def create_updates_token(user_id: int) -> str:
+        """Create a short-lived JWT that only opens the user's update stream"""
+        expire = datetime.utcnow() + timedelta(seconds=settings.UPDATE_TOKEN_EXPIRE_SECONDS)
+        payload = {
+            "user_id": user_id,
+            "scope": UPDATES_SCOPE,
+            "exp": expire,
+            "iat": datetime.utcnow()
+        }
+        return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
+    @staticmethod
+    def verify_token(token: str, scope: Optional[str] = None) -> int:
+        """Verify JWT token and return user ID
+
+        Access tokens carry no scope; scoped tokens are only accepted where
+        that scope is asked for.
+        """
+        user_id = _token_cache.get((scope, token))
+        if user_id is not None:
+            return user_id
+        
         try:
-            payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+            # Tokens without an expiry are rejected, so none is cached forever
+            payload = jwt.decode(
+                token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM], options={"require": ["exp"]}
+            )
             user_id = payload.get("user_id")
             
-            if user_id is None:
+            if user_id is None or payload.get("scope") != scope:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Invalid token payload"
                 )
             
+            _token_cache.set((scope, token), user_id, ttl=payload["exp"] - time.time())
             return user_id
             
         except jwt.ExpiredSignatureError:
@@ -41,17 +76,17 @@ class AuthService:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token has expired"
             )
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
 
     @staticmethod
-    def register_user(username: str, password: str) -> dict:
+    async def register_user(username: str, password: str) -> dict:
         """Register new user"""
         # Check if username already exists
-        if UserDB.username_exists(username):
+        if await run_db(UserDB.username_exists, username):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already exists"
@@ -66,7 +101,8 @@ class AuthService:
         
         # Create user
         try:
-            user_id = UserDB.create_user(username, password)
+            password_hash = await password_hasher.hash_async(password)
+            user_id = await run_db(UserDB.create_user, username, password_hash)
             token = AuthService.create_access_token(user_id)
             
             return {
@@ -81,16 +117,23 @@ class AuthService:
             )
 
     @staticmethod
-    def login_user(username: str, password: str) -> dict:
+    async def login_user(username: str, password: str) -> dict:
         """Login user and return token"""
-        user = UserDB.get_user_by_credentials(username, password)
+        user = await run_db(UserDB.get_user_with_password_hash, username)
+        # Unknown usernames still pay for one verification, so timing does not reveal them
+        valid, needs_rehash = await password_hasher.verify_async(password, user["password_hash"] if user else None)
         
-        if not user:
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid username or password"
             )
         
+        # Upgrade legacy SHA-256 hashes (and outdated scrypt parameters) on successful login
+        if needs_rehash:
+            new_hash = await password_hasher.hash_async(password)
+            await run_db(UserDB.update_password_hash, user["id"], user["password_hash"], new_hash)
+        
         token = AuthService.create_access_token(user["id"])
         
         return {
@@ -103,9 +146,13 @@ def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(secu
     """Dependency to get current authenticated user ID"""
     return AuthService.verify_token(credentials.credentials)
 
-def get_current_user(user_id: int = Depends(get_current_user_id)) -> dict:
+def get_updates_user_id(token: str = Query(..., description="Token from POST /telegram/updates/token")) -> int:
+    """Dependency authenticating the update stream, which EventSource opens without headers"""
+    return AuthService.verify_token(token, UPDATES_SCOPE)
+
+async def get_current_user(user_id: int = Depends(get_current_user_id)) -> dict:
     """Dependency to get current authenticated user data"""
-    user = UserDB.get_user_by_id(user_id)
+    user = await run_db(UserDB.get_user_by_id, user_id)
     
     if not user:
         raise HTTPException(
@@ -0,0 +1,341 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from fastapi import HTTPException, status
+
+from ..config import settings
+from ..metrics import TELEGRAM_LATENCY, service_stats
+from ..shared_state import WORKER_ID, StateBackend, shared_state
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+
+# How often a worker waiting for another worker's lease retries
+LEASE_POLL_INTERVAL = 0.25
+
+class _PoolEntry:
+    """Connected client together with its bookkeeping data"""
+    __slots__ = ("client", "session_string", "last_used", "in_use")
+
+    def __init__(self, client: "TelegramClient", session_string: str):
+        self.client = client
+        self.session_string = session_string
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+    def checkin(self):
+        """Give back one borrow of the client"""
+        self.in_use -= 1
+        self.last_used = time.monotonic()
+
+class ClientLoan:
+    """A client checked out past a `with` block, such as by a streaming response
+
+    It is returned exactly once: by `release()` or, if the holder never got
+    to run its cleanup, when the loan is garbage collected.
+    """
+    __slots__ = ("client", "_entry")
+
+    def __init__(self, entry: _PoolEntry):
+        self.client = entry.client
+        self._entry: Optional[_PoolEntry] = entry
+
+    def release(self):
+        """Return the client to the pool; later calls do nothing"""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            entry.checkin()
+
+    def __del__(self):
+        self.release()
+
+class TelegramClientPool:
+    """Long-lived, authorized Telegram clients keyed by user ID
+
+    A worker only connects an account while holding its lease in the shared
+    state, so several workers never open duplicate MTProto connections for one
+    account. The lease is kept for as long as the client stays pooled and
+    requests reaching other workers are forwarded to its owner.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.CLIENT_POOL_MAX_SIZE,
+        idle_timeout: float = settings.CLIENT_POOL_IDLE_TIMEOUT,
+        health_check_interval: float = settings.CLIENT_POOL_HEALTH_CHECK_INTERVAL,
+        client_factory: Optional[Callable[[str], "TelegramClient"]] = None,
+        state: StateBackend = shared_state,
+        worker_id: str = WORKER_ID,
+        lease_ttl: float = settings.CLIENT_LEASE_TTL,
+        lease_renew_interval: float = settings.CLIENT_LEASE_RENEW_INTERVAL,
+        lease_wait: float = settings.CLIENT_LEASE_WAIT
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.client_factory = client_factory or self._default_client_factory
+        self.state = state
+        self.worker_id = worker_id
+        self.lease_ttl = lease_ttl
+        self.lease_renew_interval = lease_renew_interval
+        self.lease_wait = lease_wait
+        self._entries: "OrderedDict[int, _PoolEntry]" = OrderedDict()
+        self._retired: List[_PoolEntry] = []
+        self._open_hooks: List[Callable[[int, "TelegramClient"], None]] = []
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._lease_task: Optional[asyncio.Task] = None
+        self.lease_waits = 0
+
+    @staticmethod
+    def _default_client_factory(session_string: str) -> "TelegramClient":
+        """Build a client for a stored session string
+
+        FloodWait errors are raised instead of slept through so the scheduler
+        can pause the whole account and honor request deadlines.
+        """
+        from telethon import TelegramClient
+        from telethon.sessions import StringSession
+
+        return TelegramClient(
+            StringSession(session_string), settings.TELEGRAM_API_ID, settings.TELEGRAM_API_HASH,
+            flood_sleep_threshold=0
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def clients(self) -> int:
+        return len(self._entries)
+
+    @property
+    def busy(self) -> int:
+        return sum(1 for entry in self._entries.values() if entry.in_use)
+
+    async def start(self):
+        """Start the background maintenance and lease renewal loops"""
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+        if self._lease_task is None:
+            self._lease_task = asyncio.create_task(self._lease_loop())
+
+    async def close(self):
+        """Stop the background loops, disconnect every pooled client and release its lease"""
+        for task in (self._maintenance_task, self._lease_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._maintenance_task = None
+        self._lease_task = None
+
+        user_ids = list(self._entries)
+        entries = list(self._entries.values()) + self._retired
+        self._entries.clear()
+        self._retired.clear()
+        self._user_locks.clear()
+        await asyncio.gather(*(self._disconnect(entry) for entry in entries))
+        await asyncio.gather(*(self._release_lease(user_id) for user_id in user_ids))
+
+    @asynccontextmanager
+    async def connection(self, user_id: int, session_string: str):
+        """Borrow an authorized client for the user, connecting it if needed"""
+        entry = await self._checkout(user_id, session_string)
+        try:
+            yield entry.client
+        finally:
+            entry.checkin()
+
+    async def lend(self, user_id: int, session_string: str) -> ClientLoan:
+        """Check out a client that the caller must release itself"""
+        return ClientLoan(await self._checkout(user_id, session_string))
+
+    def add_open_hook(self, hook: Callable[[int, "TelegramClient"], None]):
+        """Call `hook(user_id, client)` for every client the pool connects, e.g. to add event handlers"""
+        self._open_hooks.append(hook)
+
+    async def release(self, user_id: int):
+        """Drop and disconnect the user's client (e.g. after logout)"""
+        entry = self._entries.pop(user_id, None)
+        self._user_locks.pop(user_id, None)
+        if entry:
+            await self._disconnect(entry)
+            await self._release_lease(user_id)
+
+    async def _checkout(self, user_id: int, session_string: str) -> _PoolEntry:
+        """Return a connected entry for the user with its usage counter taken"""
+        lock = self._user_locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(user_id)
+
+            # A new session (reconnect) or a dropped socket invalidates the entry
+            if entry and (entry.session_string != session_string or not entry.client.is_connected()):
+                if entry.session_string != session_string or entry.in_use == 0:
+                    self._entries.pop(user_id, None)
+                    await self._disconnect(entry)
+                    entry = None
+                else:
+                    await entry.client.connect()
+
+            if entry is None:
+                await self._acquire_lease(user_id)
+                try:
+                    entry = await self._open(session_string)
+                    for hook in self._open_hooks:
+                        hook(user_id, entry.client)
+                    await self._make_room()
+                except BaseException:
+                    # The entry is not pooled yet, so nothing else would close it
+                    if entry is not None:
+                        await self._disconnect(entry)
+                    await self._release_lease(user_id)
+                    raise
+
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+            return entry
+
+    async def _open(self, session_string: str) -> _PoolEntry:
+        """Connect a new client and make sure the session is still authorized"""
+        client = self.client_factory(session_string)
+        with TELEGRAM_LATENCY.labels("connect").time():
+            await client.connect()
+
+        with TELEGRAM_LATENCY.labels("authorize").time():
+            authorized = await client.is_user_authorized()
+
+        if not authorized:
+            await client.disconnect()
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Telegram session expired. Please reconnect."
+            )
+
+        return _PoolEntry(client, session_string)
+
+    async def _make_room(self):
+        """Evict least recently used idle clients until there is space for one more"""
+        while len(self._entries) >= self.max_size:
+            victim = next((uid for uid, entry in self._entries.items() if entry.in_use == 0), None)
+            if victim is None:
+                # Every pooled client is busy; allow a temporary overshoot
+                return
+            await self._disconnect(self._entries.pop(victim))
+            await self._release_lease(victim)
+
+    async def _maintenance_loop(self):
+        """Periodically evict idle clients and drop broken connections"""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.evict_idle()
+                await self.health_check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Telegram client pool maintenance failed: {e}")
+
+    async def evict_idle(self):
+        """Disconnect clients that have not been used for longer than the idle timeout"""
+        deadline = time.monotonic() - self.idle_timeout
+        expired = [
+            uid for uid, entry in self._entries.items()
+            if entry.in_use == 0 and entry.last_used < deadline
+        ]
+        for uid in expired:
+            await self._disconnect(self._entries.pop(uid))
+            await self._release_lease(uid)
+
+    async def health_check(self):
+        """Drop idle clients whose connection has been lost"""
+        broken = [
+            uid for uid, entry in self._entries.items()
+            if entry.in_use == 0 and not entry.client.is_connected()
+        ]
+        for uid in broken:
+            await self._disconnect(self._entries.pop(uid))
+            await self._release_lease(uid)
+
+    @staticmethod
+    def lease_key(user_id: int) -> str:
+        """Shared-state key of the account's connection lease"""
+        return f"telegram-client:{user_id}"
+
+    async def _acquire_lease(self, user_id: int):
+        """Take the account's connection lease, waiting briefly for another worker to drop it"""
+        key = self.lease_key(user_id)
+        deadline = time.monotonic() + self.lease_wait
+
+        while not await self.state.acquire_lease(key, self.worker_id, self.lease_ttl):
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Telegram connection is busy in another worker, please retry",
+                    headers={"Retry-After": str(max(1, int(self.lease_renew_interval + 0.999)))}
+                )
+            self.lease_waits += 1
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+
+    async def _release_lease(self, user_id: int):
+        """Give up the account's lease, ignoring shared-state errors"""
+        try:
+            await self.state.release_lease(self.lease_key(user_id), self.worker_id)
+        except Exception as e:
+            print(f"⚠️ Failed to release Telegram client lease of user {user_id}: {e}")
+
+    async def _lease_loop(self):
+        """Periodically renew the leases of pooled clients"""
+        while True:
+            await asyncio.sleep(self.lease_renew_interval)
+            try:
+                await self.renew_leases()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Telegram client lease renewal failed: {e}")
+
+    async def renew_leases(self):
+        """Extend leases of pooled clients, retiring the ones whose lease was lost"""
+        user_ids = list(self._entries)
+        held = await self.state.renew_leases(
+            [self.lease_key(uid) for uid in user_ids], self.worker_id, self.lease_ttl
+        )
+
+        for uid in user_ids:
+            entry = self._entries.get(uid)
+            if entry is not None and self.lease_key(uid) not in held:
+                # The lease lapsed and another worker took the account over
+                del self._entries[uid]
+                self._retired.append(entry)
+
+        # Lost clients are disconnected once their last borrower is done
+        still_busy = []
+        for entry in self._retired:
+            if entry.in_use:
+                still_busy.append(entry)
+            else:
+                await self._disconnect(entry)
+        self._retired = still_busy
+        await self.state.purge()
+
+    @staticmethod
+    async def _disconnect(entry: _PoolEntry):
+        """Disconnect a client, ignoring errors from already closed sockets"""
+        try:
+            await entry.client.disconnect()
+        except Exception:
+            pass
+
+# Shared pool instance, started and closed by the app lifespan
+client_pool = TelegramClientPool()
+service_stats.register(
+    "telegram_client_pool", client_pool,
+    counters=("lease_waits",), gauges=("clients", "busy")
+)
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ..cache import content_etag
+from ..config import settings
+from ..metrics import service_stats
+
+Loader = Callable[[], Awaitable[List[dict]]]
+
+ETAG_FIELDS = ("id", "title", "type", "unread_count", "last_message")
+
+class _CacheEntry:
+    """Cached dialog list, its entity tag and the moment it was fetched"""
+    __slots__ = ("value", "etag", "fetched_at")
+
+    def __init__(self, value: List[dict]):
+        self.value = value
+        self.etag = content_etag(value, ETAG_FIELDS)
+        self.fetched_at = time.monotonic()
+
+class DialogCache:
+    """Per-user dialog lists with TTL and stale-while-revalidate refresh"""
+
+    def __init__(
+        self,
+        ttl: float = settings.DIALOG_CACHE_TTL,
+        max_stale: float = settings.DIALOG_CACHE_MAX_STALE,
+        max_entries: int = settings.DIALOG_CACHE_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._refreshing: Dict[int, asyncio.Task] = {}
+        self._generations: Dict[int, int] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, user_id: int, loader: Loader) -> List[dict]:
+        """Return the user's dialogs, fetching through `loader` only when needed"""
+        entry = self._entries.get(user_id)
+
+        if entry:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry.value
+
+            # Serve the stale copy and revalidate off the request path
+            if age < self.ttl + self.max_stale:
+                self._entries.move_to_end(user_id)
+                self.stale_hits += 1
+                self._start_refresh(user_id, loader)
+                return entry.value
+
+        # Missing or too old: wait for a (possibly shared) refresh
+        self.misses += 1
+        return await asyncio.shield(self._start_refresh(user_id, loader))
+
+    async def refresh(self, user_id: int, loader: Loader) -> List[dict]:
+        """Reload the user's dialogs now, joining a refresh already in flight"""
+        return await asyncio.shield(self._start_refresh(user_id, loader))
+
+    def revalidate(self, user_id: int, loader: Loader):
+        """Start a background refresh unless the user's dialogs are fresh or already loading"""
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry.fetched_at >= self.ttl:
+            self._start_refresh(user_id, loader)
+
+    def peek(self, user_id: int) -> Optional[List[dict]]:
+        """Return the cached dialogs regardless of age, without fetching"""
+        entry = self._entries.get(user_id)
+        return entry.value if entry else None
+
+    def etag(self, user_id: int, value: List[dict]) -> str:
+        """Get the entity tag of a dialog list, reusing the cached one when it is the same list"""
+        entry = self._entries.get(user_id)
+        if entry and entry.value is value:
+            return entry.etag
+        return content_etag(value, ETAG_FIELDS)
+
+    def invalidate(self, user_id: int):
+        """Forget the user's dialogs; in-flight refreshes will not repopulate them"""
+        self._entries.pop(user_id, None)
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def discard(self, user_id: int):
+        """Drop the user's cached dialogs, letting a refresh in flight store its result"""
+        self._entries.pop(user_id, None)
+
+    def _start_refresh(self, user_id: int, loader: Loader) -> asyncio.Task:
+        """Start a refresh for the user unless one is already running"""
+        task = self._refreshing.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(user_id, loader))
+            task.add_done_callback(lambda t: self._on_refresh_done(user_id, t))
+            self._refreshing[user_id] = task
+        return task
+
+    async def _refresh(self, user_id: int, loader: Loader) -> List[dict]:
+        """Load dialogs and store them unless the cache was invalidated meanwhile"""
+        generation = self._generations.get(user_id, 0)
+        value = await loader()
+
+        if self._generations.get(user_id, 0) == generation:
+            self._entries[user_id] = _CacheEntry(value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def _on_refresh_done(self, user_id: int, task: asyncio.Task):
+        """Clear the in-flight marker and report failed background refreshes"""
+        if self._refreshing.get(user_id) is task:
+            del self._refreshing[user_id]
+        if not task.cancelled() and task.exception() is not None and user_id in self._entries:
+            print(f"⚠️ Background dialog refresh failed for user {user_id}: {task.exception()}")
+
+# Shared dialog cache instance
+dialog_cache = DialogCache()
+service_stats.register("dialog_cache", dialog_cache, counters=("hits", "stale_hits", "misses"))
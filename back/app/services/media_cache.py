@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import TYPE_CHECKING, List, Optional
+from fastapi import HTTPException, status
+
+from ..config import settings
+from ..database import MediaDB, run_db
+from ..metrics import TELEGRAM_LATENCY, service_stats
+from .client_pool import client_pool
+from .scheduler import telegram_scheduler
+from .telegram_service import TelegramService
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+
+class MediaCache:
+    """Content-addressed on-disk cache of downloaded Telegram media
+
+    Files are stored once per SHA-256 of their content and referenced by
+    (user, chat, message, variant) rows, so repeat views are served from disk
+    without touching Telegram. The least recently used files are evicted once
+    the cache grows past its size limit.
+    """
+
+    def __init__(self, directory: str = settings.MEDIA_CACHE_DIR, max_bytes: int = settings.MEDIA_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, sha256: str) -> str:
+        """Get the on-disk location of a cached file"""
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    async def get(self, user_id: int, chat_id: int, message_id: int, thumb: bool = False) -> dict:
+        """Return the cached media of a message, downloading it on a miss"""
+        variant = "thumb" if thumb else "file"
+        cached = await run_db(MediaDB.get_media, user_id, chat_id, message_id, variant)
+        if cached and os.path.isfile(self.path_for(cached["sha256"])):
+            self.hits += 1
+            return {**cached, "path": self.path_for(cached["sha256"])}
+
+        self.misses += 1
+        session_string = await TelegramService._get_session_string(user_id)
+
+        async def download() -> dict:
+            async with client_pool.connection(user_id, session_string) as client:
+                media = await self._download(client, chat_id, message_id, thumb)
+            await run_db(
+                MediaDB.save_media, user_id, chat_id, message_id, variant,
+                media["sha256"], media["size"], media["mime_type"]
+            )
+            # The new file is about to be served, so it is never the one evicted
+            await self._evict(keep=media["sha256"])
+            return media
+
+        return await telegram_scheduler.run(user_id, ("media", user_id, chat_id, message_id, variant), download)
+
+    async def _download(self, client: "TelegramClient", chat_id: int, message_id: int, thumb: bool) -> dict:
+        """Download a message's media (or its largest thumbnail) into the cache"""
+        with TELEGRAM_LATENCY.labels("get_message").time():
+            message = await client.get_messages(chat_id, ids=message_id)
+        if message is None or not message.media:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Message has no media"
+            )
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, part_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        os.close(fd)
+
+        try:
+            with TELEGRAM_LATENCY.labels("download_media").time():
+                downloaded = await client.download_media(message, file=part_path, thumb=-1 if thumb else None)
+            if not downloaded:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Media has no thumbnail" if thumb else "Media is not downloadable"
+                )
+
+            sha256, size = await asyncio.to_thread(self._hash_file, downloaded)
+            path = self.path_for(sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(downloaded, path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        mime_type = "image/jpeg" if thumb else getattr(message.file, "mime_type", None)
+        return {
+            "sha256": sha256,
+            "size": size,
+            "mime_type": mime_type or "application/octet-stream",
+            "path": path
+        }
+
+    @staticmethod
+    def _hash_file(path: str) -> tuple:
+        """Stream a file through SHA-256, returning the hex digest and size"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), size
+
+    async def _evict(self, keep: Optional[str] = None):
+        """Drop least recently used files other than `keep` until the cache fits its size limit"""
+        evicted: List[str] = await run_db(MediaDB.evict_media, self.max_bytes, keep)
+        for sha256 in evicted:
+            try:
+                os.remove(self.path_for(sha256))
+            except FileNotFoundError:
+                pass
+
+# Shared media cache instance
+media_cache = MediaCache()
+service_stats.register("media_cache", media_cache, counters=("hits", "misses"))
@@ -0,0 +1,199 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
+from fastapi import HTTPException, status
+
+from ..config import settings
+from ..database import PendingLoginDB, run_db
+from ..metrics import TELEGRAM_LATENCY, service_stats
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+
+LoginKey = Tuple[int, str]
+
+class _PendingClient:
+    """Connected client waiting for its login code"""
+    __slots__ = ("client", "phone_code_hash", "expires_at")
+
+    def __init__(self, client: "TelegramClient", phone_code_hash: str, expires_at: float):
+        self.client = client
+        self.phone_code_hash = phone_code_hash
+        self.expires_at = expires_at
+
+class PendingLoginRegistry:
+    """Logins between send_code and verify_code
+
+    The phone_code_hash and the not yet authorized session are persisted, so
+    any worker can finish the login. The worker that sent the code also keeps
+    its client connected for fast verification; those clients are capped, and
+    expired logins are disconnected and deleted by a periodic reaper.
+    """
+
+    def __init__(
+        self,
+        ttl: float = settings.PENDING_LOGIN_TTL,
+        max_clients: int = settings.PENDING_LOGIN_MAX_CLIENTS,
+        max_pending: int = settings.PENDING_LOGIN_MAX,
+        reap_interval: float = settings.PENDING_LOGIN_REAP_INTERVAL,
+        client_factory: Optional[Callable[[str], "TelegramClient"]] = None
+    ):
+        self.ttl = ttl
+        self.max_clients = max_clients
+        self.max_pending = max_pending
+        self.reap_interval = reap_interval
+        self.client_factory = client_factory or self._default_client_factory
+        self._clients: "OrderedDict[LoginKey, _PendingClient]" = OrderedDict()
+        self._reaper_task: Optional[asyncio.Task] = None
+        self.started = 0
+        self.completed = 0
+        self.expired = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _default_client_factory(session_string: str) -> "TelegramClient":
+        """Build a client for a new or pending session"""
+        from telethon import TelegramClient
+        from telethon.sessions import StringSession
+
+        return TelegramClient(StringSession(session_string), settings.TELEGRAM_API_ID, settings.TELEGRAM_API_HASH)
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    async def start(self):
+        """Start the background reaper"""
+        if self._reaper_task is None:
+            self._reaper_task = asyncio.create_task(self._reaper_loop())
+
+    async def close(self):
+        """Stop the reaper and disconnect local clients; persisted logins stay valid"""
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+            self._reaper_task = None
+
+        entries = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(self._disconnect(entry.client) for entry in entries))
+
+    async def begin(self, user_id: int, phone_number: str):
+        """Connect a fresh client, request a login code and register the pending login"""
+        key = (user_id, phone_number)
+        await self._drop_client(key)
+
+        client = self.client_factory("")
+        try:
+            with TELEGRAM_LATENCY.labels("connect").time():
+                await client.connect()
+            with TELEGRAM_LATENCY.labels("send_code").time():
+                sent = await client.send_code_request(phone_number)
+
+            expires_at = time.time() + self.ttl
+            stored = await run_db(
+                PendingLoginDB.save_pending_login, user_id, phone_number, sent.phone_code_hash,
+                client.session.save(), expires_at, self.max_pending
+            )
+        except BaseException:
+            await self._disconnect(client)
+            raise
+
+        if not stored:
+            self.rejected += 1
+            await self._disconnect(client)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many pending Telegram logins, try again later"
+            )
+
+        self.started += 1
+        await self._make_room()
+        self._clients[key] = _PendingClient(client, sent.phone_code_hash, expires_at)
+
+    async def resume(self, user_id: int, phone_number: str) -> Tuple["TelegramClient", str]:
+        """Get a connected client and the phone_code_hash of a pending login"""
+        key = (user_id, phone_number)
+        entry = self._clients.get(key)
+        if entry and entry.expires_at > time.time() and entry.client.is_connected():
+            return entry.client, entry.phone_code_hash
+        await self._drop_client(key)
+
+        # Sent by another worker (or before a restart): rebuild it from the stored session
+        pending = await run_db(PendingLoginDB.get_pending_login, user_id, phone_number)
+        if not pending:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No active connection found. Please request a new code."
+            )
+
+        client = self.client_factory(pending["session_string"])
+        try:
+            with TELEGRAM_LATENCY.labels("connect").time():
+                await client.connect()
+        except BaseException:
+            await self._disconnect(client)
+            raise
+
+        await self._make_room()
+        self._clients[key] = _PendingClient(client, pending["phone_code_hash"], pending["expires_at"])
+        return client, pending["phone_code_hash"]
+
+    async def finish(self, user_id: int, phone_number: str, completed: bool = False):
+        """Forget a pending login and disconnect its client"""
+        if completed:
+            self.completed += 1
+        await self._drop_client((user_id, phone_number))
+        await run_db(PendingLoginDB.delete_pending_login, user_id, phone_number)
+
+    async def _drop_client(self, key: LoginKey):
+        """Disconnect the local client of a login, if any"""
+        entry = self._clients.pop(key, None)
+        if entry:
+            await self._disconnect(entry.client)
+
+    async def _make_room(self):
+        """Disconnect the oldest local clients while at the cap; their logins stay resumable"""
+        while len(self._clients) >= self.max_clients:
+            _, entry = self._clients.popitem(last=False)
+            self.evicted += 1
+            await self._disconnect(entry.client)
+
+    async def _reaper_loop(self):
+        """Periodically drop expired logins"""
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Pending login cleanup failed: {e}")
+
+    async def reap(self):
+        """Disconnect expired local clients and delete expired persisted logins"""
+        now = time.time()
+        expired = [key for key, entry in self._clients.items() if entry.expires_at <= now]
+        for key in expired:
+            await self._drop_client(key)
+        self.expired += await run_db(PendingLoginDB.delete_expired_logins)
+
+    @staticmethod
+    async def _disconnect(client: "TelegramClient"):
+        """Disconnect a client, ignoring errors from already closed sockets"""
+        try:
+            await client.disconnect()
+        except Exception:
+            pass
+
+# Shared registry instance, started and closed by the app lifespan
+pending_logins = PendingLoginRegistry()
+service_stats.register(
+    "pending_logins", pending_logins,
+    counters=("started", "completed", "expired", "evicted", "rejected"), gauges=("clients",)
+)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+from fastapi import HTTPException, status
+
+from ..cache import TTLCache
+from ..config import settings
+from ..metrics import service_stats
+from ..shared_state import StateBackend, shared_state
+
+T = TypeVar("T")
+
+class _AccountLimiter:
+    """Token bucket plus FloodWait pause for one Telegram account"""
+    __slots__ = ("rate", "capacity", "tokens", "updated_at", "paused_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller has to wait for it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def refund(self):
+        """Give back a token reserved by a caller that gave up"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class TelegramScheduler:
+    """Central gate for outbound Telegram calls
+
+    Every account gets a token bucket; a FloodWait pauses the whole account and
+    the call is retried if the pause ends before the request deadline. Pauses
+    are published to the shared state so other workers honor them too. Calls
+    sharing a key while one is in flight are coalesced into a single upstream call.
+    """
+
+    def __init__(
+        self,
+        rate: float = settings.TELEGRAM_RATE_LIMIT,
+        burst: int = settings.TELEGRAM_RATE_BURST,
+        deadline: float = settings.TELEGRAM_REQUEST_DEADLINE,
+        state: StateBackend = shared_state
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.deadline = deadline
+        self.state = state
+        self._limiters = TTLCache(max_size=100000, ttl=3600)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.flood_waits = 0
+        self.coalesced = 0
+
+    async def run(
+        self,
+        user_id: int,
+        key: Optional[Hashable],
+        call: Callable[[], Awaitable[T]],
+        deadline: Optional[float] = None
+    ) -> T:
+        """Run `call` for the account, sharing the result with identical in-flight calls"""
+        if key is not None and key in self._inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight[key])
+
+        task = asyncio.create_task(self._execute(user_id, call, deadline or self.deadline))
+        if key is not None:
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None) if self._inflight.get(key) is t else None)
+
+        return await asyncio.shield(task)
+
+    def _limiter(self, user_id: int) -> _AccountLimiter:
+        """Get the account's limiter, keeping it alive while it is used"""
+        limiter = self._limiters.get(user_id)
+        if limiter is None:
+            limiter = _AccountLimiter(self.rate, self.burst)
+        self._limiters.set(user_id, limiter)
+        return limiter
+
+    async def _execute(self, user_id: int, call: Callable[[], Awaitable[T]], timeout: float) -> T:
+        """Wait for the account's turn and retry on FloodWait until the deadline"""
+        from telethon.errors import FloodWaitError
+
+        deadline = time.monotonic() + timeout
+        limiter = self._limiter(user_id)
+
+        # Pick up a FloodWait another worker ran into (stored as a wall-clock time)
+        paused_until = await self.state.get(self._pause_key(user_id))
+        if paused_until:
+            limiter.paused_until = max(limiter.paused_until, time.monotonic() + float(paused_until) - time.time())
+
+        while True:
+            wait = limiter.reserve()
+            if time.monotonic() + wait > deadline:
+                limiter.refund()
+                raise self._too_many_requests(wait)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                return await call()
+            except FloodWaitError as e:
+                self.flood_waits += 1
+                limiter.paused_until = max(limiter.paused_until, time.monotonic() + e.seconds)
+                await self.state.set(self._pause_key(user_id), str(time.time() + e.seconds), e.seconds)
+
+    @staticmethod
+    def _pause_key(user_id: int) -> str:
+        return f"flood-wait:{user_id}"
+
+    @staticmethod
+    def _too_many_requests(wait: float) -> HTTPException:
+        """Build the error returned when the account cannot be served in time"""
+        retry_after = max(1, int(wait + 0.999))
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Telegram rate limit reached, retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+# Shared scheduler instance
+telegram_scheduler = TelegramScheduler()
+service_stats.register("telegram_scheduler", telegram_scheduler, counters=("flood_waits", "coalesced"))
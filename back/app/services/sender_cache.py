@@ -0,0 +1,98 @@
+from typing import Dict, Iterable, Optional
+
+from ..cache import TTLCache
+from ..config import settings
+from ..database import EntityDB, run_db
+from ..metrics import service_stats
+
+def display_name(sender) -> Optional[str]:
+    """Build a human readable name for a user, chat or channel entity"""
+    first_name = getattr(sender, "first_name", None)
+    if first_name:
+        last_name = getattr(sender, "last_name", None)
+        return f"{first_name} {last_name}" if last_name else first_name
+
+    title = getattr(sender, "title", None)
+    if title:
+        return title
+
+    username = getattr(sender, "username", None)
+    if username:
+        return f"@{username}"
+
+    return None
+
+class SenderCache:
+    """Per-user sender display names: in-memory LRU in front of the telegram_entities table
+
+    Names are resolved from message senders at most once per refresh interval;
+    stored names older than that are rebuilt lazily the next time the sender shows up.
+    """
+
+    def __init__(
+        self,
+        users: int = settings.SENDER_CACHE_USERS,
+        size_per_user: int = settings.SENDER_CACHE_SIZE,
+        refresh_interval: int = settings.SENDER_CACHE_REFRESH_INTERVAL
+    ):
+        self.size_per_user = size_per_user
+        self.refresh_interval = refresh_interval
+        self._users = TTLCache(users, refresh_interval)
+        self.hits = 0
+        self.misses = 0
+
+    def _names(self, user_id: int) -> TTLCache:
+        """Get the user's in-memory name cache"""
+        names = self._users.get(user_id)
+        if names is None:
+            names = TTLCache(self.size_per_user, self.refresh_interval)
+        self._users.set(user_id, names)
+        return names
+
+    async def resolve(self, user_id: int, messages: Iterable) -> Dict[int, str]:
+        """Map the sender IDs of the messages to display names"""
+        names = self._names(user_id)
+        senders = {}
+        resolved: Dict[int, str] = {}
+
+        for message in messages:
+            sender_id = message.sender_id
+            if sender_id is None or sender_id in resolved or sender_id in senders:
+                continue
+            name = names.get(sender_id)
+            if name is not None:
+                resolved[sender_id] = name
+            else:
+                senders[sender_id] = message.sender
+
+        self.hits += len(resolved)
+        self.misses += len(senders)
+        if not senders:
+            return resolved
+
+        stored = await run_db(EntityDB.get_display_names, user_id, list(senders), self.refresh_interval)
+
+        fresh = {}
+        for sender_id, sender in senders.items():
+            name = stored.get(sender_id)
+            if name is None and sender is not None:
+                name = display_name(sender)
+                if name is not None:
+                    fresh[sender_id] = name
+            if name is not None:
+                names.set(sender_id, name)
+                resolved[sender_id] = name
+
+        if fresh:
+            await run_db(EntityDB.save_display_names, user_id, fresh)
+
+        return resolved
+
+    async def forget_user(self, user_id: int):
+        """Drop every cached name of the user (e.g. after switching accounts)"""
+        self._users.invalidate(user_id)
+        await run_db(EntityDB.clear_user, user_id)
+
+# Shared sender cache instance
+sender_cache = SenderCache()
+service_stats.register("sender_cache", sender_cache, counters=("hits", "misses"))
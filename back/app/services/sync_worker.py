@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from fastapi import Depends, HTTPException
+
+from ..config import settings
+from ..metrics import service_stats
+from .auth_service import get_current_user_id
+from .telegram_service import TelegramService
+
+# Lower values are served first
+PRIORITY_DIALOGS = 0
+PRIORITY_MESSAGES = 1
+
+Job = Tuple[str, int, Optional[int]]
+
+class SyncWorkerPool:
+    """Bounded pool of asyncio workers pre-warming data of recently active users
+
+    A scheduler periodically queues a dialog refresh for every user seen within
+    the activity window; each refresh then queues message syncs for the user's
+    most recent chats. Requests serve those synced pages from the local store
+    without calling Telegram for up to MESSAGE_MAX_STALE, so a round every
+    SYNC_INTERVAL keeps active chats off the Telegram request path. The queue
+    is bounded: when it is full, new jobs are dropped until the workers catch up.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.SYNC_WORKERS,
+        queue_size: int = settings.SYNC_QUEUE_SIZE,
+        interval: float = settings.SYNC_INTERVAL,
+        active_window: float = settings.SYNC_ACTIVE_WINDOW,
+        chats_per_user: int = settings.SYNC_CHATS_PER_USER,
+        messages_per_chat: int = settings.SYNC_MESSAGES_PER_CHAT
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.interval = interval
+        self.active_window = active_window
+        self.chats_per_user = chats_per_user
+        self.messages_per_chat = messages_per_chat
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._pending: Set[Job] = set()
+        self._activity: Dict[int, float] = {}
+        self._order = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def record_activity(self, user_id: int):
+        """Mark the user as active so their data keeps being pre-warmed"""
+        self._activity[user_id] = time.monotonic()
+
+    def forget(self, user_id: int):
+        """Stop pre-warming the user's data"""
+        self._activity.pop(user_id, None)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(self, priority: int, kind: str, user_id: int, chat_id: Optional[int] = None) -> bool:
+        """Queue a job unless it is already pending; return False when the queue is full"""
+        if self._queue is None:
+            return False
+
+        job = (kind, user_id, chat_id)
+        if job in self._pending:
+            return True
+
+        try:
+            self._queue.put_nowait((priority, next(self._order), job))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        self._pending.add(job)
+        return True
+
+    async def start(self):
+        """Start the scheduler and worker tasks"""
+        if self._tasks:
+            return
+
+        self._queue = asyncio.PriorityQueue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._schedule())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Cancel all tasks and drop queued jobs"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending.clear()
+
+    async def _schedule(self):
+        """Queue dialog refreshes for recently active users, most recent first"""
+        while True:
+            await asyncio.sleep(self.interval)
+
+            cutoff = time.monotonic() - self.active_window
+            for user_id, seen_at in list(self._activity.items()):
+                if seen_at < cutoff:
+                    del self._activity[user_id]
+
+            for user_id, _ in sorted(self._activity.items(), key=lambda item: item[1], reverse=True):
+                if not self.submit(PRIORITY_DIALOGS, "dialogs", user_id):
+                    # Backpressure: the workers are behind, try again next round
+                    break
+
+    async def _work(self):
+        """Run queued jobs one at a time"""
+        while True:
+            _, _, job = await self._queue.get()
+            self._pending.discard(job)
+            try:
+                await self._run(*job)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except HTTPException as e:
+                self.failed += 1
+                # The user has no usable Telegram session any more, or
+                # another worker holds the account and keeps it warm
+                if e.status_code in (400, 401, 503):
+                    self.forget(job[1])
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ Background sync {job} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, kind: str, user_id: int, chat_id: Optional[int]):
+        """Execute a single sync job"""
+        if kind == "dialogs":
+            chats = await TelegramService.refresh_chats(user_id)
+            for chat in chats[:self.chats_per_user]:
+                if not self.submit(PRIORITY_MESSAGES, "messages", user_id, chat["id"]):
+                    break
+        elif kind == "messages":
+            await TelegramService.sync_chat(user_id, chat_id, self.messages_per_chat)
+
+# Shared worker pool, started and closed by the app lifespan
+sync_workers = SyncWorkerPool()
+service_stats.register("sync_workers", sync_workers, counters=("completed", "failed", "dropped"), gauges=("queued",))
+
+def get_active_user_id(user_id: int = Depends(get_current_user_id)) -> int:
+    """Dependency returning the current user ID and marking the user as active"""
+    sync_workers.record_activity(user_id)
+    return user_id
@@ -1,21 +1,62 @@
 import asyncio
-from typing import Dict, List, Optional, Any
-from telethon import TelegramClient
-from telethon.sessions import StringSession
-from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError
+import csv
+import io
+import json
+from datetime import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Any, Set, Tuple
 from fastapi import HTTPException, status
 
-from ..database import TelegramDB
+from ..database import TelegramDB, MessageDB, MediaDB, ChatSummaryDB, run_db
+from ..cache import TTLCache, content_etag
 from ..config import settings
+from ..metrics import TELEGRAM_LATENCY, service_stats
+from .client_pool import client_pool
+from .dialog_cache import dialog_cache
+from .pending_logins import pending_logins
+from .scheduler import telegram_scheduler
+from .sender_cache import sender_cache, display_name
 
-class TelegramService:
-    # Store temporary clients during authentication process
-    _temp_clients: Dict[str, TelegramClient] = {}
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+
+# Message fields whose changes make a cached page stale
+MESSAGE_ETAG_FIELDS = ("id", "text", "date", "from_user", "from_user_id", "media_type")
+
+# Background revalidations of stale message pages, kept referenced until done
+_revalidations: Set[asyncio.Task] = set()
+
+def _on_revalidated(task: asyncio.Task):
+    """Forget a finished revalidation and report failures"""
+    _revalidations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Background message sync failed: {task.exception()}")
+
+# Peer folders Telegram knows about: the main list and the archive
+DIALOG_FOLDERS = (0, 1)
+
+# Sort keys of dialog listings that need the whole folder
+DIALOG_SORT_KEYS = {
+    "title": lambda chat: (chat["title"].casefold(), chat["id"]),
+    "unread": lambda chat: (-(chat["unread_count"] or 0), chat["id"]),
+}
 
+# Complete folder listings per (user, folder), for sorted dialog pages
+_folder_listings = TTLCache(settings.DIALOG_CACHE_MAX_ENTRIES, settings.DIALOG_CACHE_TTL)
+service_stats.register("folder_listings", _folder_listings, counters=("hits", "misses"))
+
+class TelegramService:
     @classmethod
-    def _get_client_key(cls, user_id: int, phone_number: str) -> str:
-        """Generate unique key for temporary client storage"""
-        return f"{user_id}_{phone_number}"
+    async def _get_session_string(cls, user_id: int) -> str:
+        """Get the stored session string of the user's active Telegram session"""
+        session_data = await run_db(TelegramDB.get_active_session, user_id)
+        
+        if not session_data:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No active Telegram session found"
+            )
+        
+        return session_data["session_string"]
 
     @classmethod
     async def send_code(cls, user_id: int, phone_number: str) -> dict:
@@ -27,23 +68,17 @@ class TelegramService:
             )
             
         try:
-            client = TelegramClient(StringSession(), settings.TELEGRAM_API_ID, settings.TELEGRAM_API_HASH)
-            await client.connect()
-            
-            if not await client.is_user_authorized():
-                await client.send_code_request(phone_number)
-            
-            # Store client temporarily for code verification
-            client_key = cls._get_client_key(user_id, phone_number)
-            cls._temp_clients[client_key] = client
+            # Keep the login pending until the code is verified
+            await pending_logins.begin(user_id, phone_number)
             
             return {
                 "message": "Verification code sent to your phone",
                 "requires_code": True
             }
             
+        except HTTPException:
+            raise
         except Exception as e:
-            await client.disconnect()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to send code: {str(e)}"
@@ -52,19 +87,13 @@ class TelegramService:
     @classmethod
     async def verify_code(cls, user_id: int, phone_number: str, code: str, password: Optional[str] = None) -> dict:
         """Verify phone code and optional 2FA password"""
-        client_key = cls._get_client_key(user_id, phone_number)
+        from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError
         
-        if client_key not in cls._temp_clients:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No active connection found. Please request a new code."
-            )
-        
-        client = cls._temp_clients[client_key]
+        client, phone_code_hash = await pending_logins.resume(user_id, phone_number)
         
         try:
             # Try to sign in with the code
-            await client.sign_in(phone_number, code)
+            await client.sign_in(phone_number, code, phone_code_hash=phone_code_hash)
             
         except SessionPasswordNeededError:
             if not password:
@@ -77,23 +106,20 @@ class TelegramService:
             try:
                 await client.sign_in(password=password)
             except Exception as e:
-                await client.disconnect()
-                del cls._temp_clients[client_key]
+                await pending_logins.finish(user_id, phone_number)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid 2FA password"
                 )
                 
         except PhoneCodeInvalidError:
-            await client.disconnect()
-            del cls._temp_clients[client_key]
+            await pending_logins.finish(user_id, phone_number)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid verification code"
             )
         except Exception as e:
-            await client.disconnect()
-            del cls._temp_clients[client_key]
+            await pending_logins.finish(user_id, phone_number)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Authentication failed: {str(e)}"
@@ -102,17 +128,21 @@ class TelegramService:
         # Save session to database
         try:
             session_string = client.session.save()
-            TelegramDB.save_session(user_id, session_string, phone_number)
+            await run_db(TelegramDB.save_session, user_id, session_string, phone_number)
+            await run_db(MessageDB.clear_user, user_id)
+            await run_db(MediaDB.clear_user, user_id)
+            await run_db(ChatSummaryDB.clear_user, user_id)
+            dialog_cache.invalidate(user_id)
+            cls._forget_folders(user_id)
+            await sender_cache.forget_user(user_id)
             
-            # Clean up temporary client
-            await client.disconnect()
-            del cls._temp_clients[client_key]
+            # Clean up the pending login
+            await pending_logins.finish(user_id, phone_number, completed=True)
             
             return {"message": "Telegram account connected successfully"}
             
         except Exception as e:
-            await client.disconnect()
-            del cls._temp_clients[client_key]
+            await pending_logins.finish(user_id, phone_number)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to save session"
@@ -120,139 +150,673 @@ class TelegramService:
 
     @classmethod
     async def get_chats(cls, user_id: int) -> List[dict]:
-        """Get list of user's chats"""
-        session_data = TelegramDB.get_active_session(user_id)
+        """Get list of user's chats, served from the dialog cache when fresh"""
+        session_string = await cls._get_session_string(user_id)
+        return await dialog_cache.get(user_id, cls._chats_loader(user_id, session_string))
+
+    @classmethod
+    async def get_chat_summaries(cls, user_id: int) -> List[dict]:
+        """Get the chat list with last messages from the local store
+
+        Summaries are kept current from update events; stale ones are
+        revalidated against Telegram in the background. Only an account
+        without stored summaries waits for Telegram.
+        """
+        session_string = await cls._get_session_string(user_id)
+        loader = cls._chats_loader(user_id, session_string)
+        rows = await run_db(ChatSummaryDB.get_summaries, user_id)
+        if not rows:
+            return await dialog_cache.get(user_id, loader)
         
-        if not session_data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No active Telegram session found"
-            )
+        dialog_cache.revalidate(user_id, loader)
+        return [cls._summary_from_row(row) for row in rows]
+
+    @staticmethod
+    def _summary_from_row(row: dict) -> dict:
+        """Convert a chat_summaries row into the API chat shape"""
+        last_message = None
+        if row["last_message_id"] is not None:
+            last_message = {
+                "id": row["last_message_id"],
+                "text": row["last_message_text"],
+                "date": row["last_message_date"],
+                "from_user": row["last_message_from"],
+                "from_user_id": row["last_message_from_id"],
+                "media_type": row["last_message_media_type"]
+            }
+        
+        return {
+            "id": row["chat_id"],
+            "title": row["title"],
+            "type": row["type"],
+            "unread_count": row["unread_count"],
+            "last_message": last_message
+        }
+
+    @classmethod
+    async def refresh_chats(cls, user_id: int) -> List[dict]:
+        """Reload the user's chats into the dialog cache regardless of its age"""
+        session_string = await cls._get_session_string(user_id)
+        return await dialog_cache.refresh(user_id, cls._chats_loader(user_id, session_string))
+
+    @staticmethod
+    def chats_etag(user_id: int, chats: List[dict]) -> str:
+        """Get the entity tag of a chat list returned by get_chats"""
+        return dialog_cache.etag(user_id, chats)
+
+    @staticmethod
+    def messages_etag(page: dict) -> str:
+        """Get the entity tag of a message page returned by get_messages"""
+        return content_etag(page["messages"], MESSAGE_ETAG_FIELDS)
+
+    @classmethod
+    def _chats_loader(cls, user_id: int, session_string: str):
+        """Build the dialog cache loader going through the scheduler"""
+        return lambda: telegram_scheduler.run(
+            user_id, ("chats", user_id), lambda: cls._load_chats(user_id, session_string)
+        )
+
+    @classmethod
+    async def _load_chats(cls, user_id: int, session_string: str) -> List[dict]:
+        """Fetch the user's dialogs from Telegram"""
+        from telethon.errors import FloodWaitError
         
-        client = None
         try:
-            client = TelegramClient(StringSession(session_data["session_string"]), settings.TELEGRAM_API_ID, settings.TELEGRAM_API_HASH)
-            await client.connect()
-            
-            if not await client.is_user_authorized():
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Telegram session expired. Please reconnect."
-                )
-            
-            chats = []
-            async for dialog in client.iter_dialogs(limit=100):
-                chat_type = "user"
-                if dialog.is_channel:
-                    chat_type = "channel"
-                elif dialog.is_group:
-                    chat_type = "group"
+            async with client_pool.connection(user_id, session_string) as client:
+                chats = []
+                with TELEGRAM_LATENCY.labels("dialogs").time():
+                    dialogs = [dialog async for dialog in client.iter_dialogs(limit=100)]
                 
-                chats.append({
-                    "id": dialog.id,
-                    "title": dialog.title or "Unnamed Chat",
-                    "type": chat_type,
-                    "unread_count": dialog.unread_count
-                })
+                for dialog in dialogs:
+                    chats.append(cls._format_dialog(dialog))
             
+            await run_db(ChatSummaryDB.replace_summaries, user_id, chats)
             return chats
             
+        except (HTTPException, FloodWaitError):
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to load chats: {str(e)}"
             )
-        finally:
-            if client:
-                await client.disconnect()
 
     @classmethod
-    async def get_messages(cls, user_id: int, chat_id: int, limit: int = 50) -> List[dict]:
-        """Get messages from a specific chat"""
-        session_data = TelegramDB.get_active_session(user_id)
+    async def get_dialogs(
+        cls,
+        user_id: int,
+        limit: int = 50,
+        offset_date: Optional[datetime] = None,
+        offset_id: int = 0,
+        offset_peer: Optional[int] = None,
+        folder: int = 0,
+        chat_type: Optional[str] = None,
+        sort: str = "recent"
+    ) -> dict:
+        """Get a page of dialogs of a folder, optionally of a single type
+
+        Recent pages are read from Telegram at the offsets of the previous page's
+        `next_offset`. Title and unread ordering need the whole folder, which is
+        enumerated once and cached; their pages continue after `offset_peer`.
+        """
+        session_string = await cls._get_session_string(user_id)
+        
+        if sort in DIALOG_SORT_KEYS:
+            chats = await cls._get_folder_listing(user_id, session_string, folder)
+            return cls._sorted_dialog_page(chats, limit, offset_peer, chat_type, sort)
+        
+        return await telegram_scheduler.run(
+            user_id,
+            ("dialogs", user_id, folder, chat_type, limit, offset_date, offset_id, offset_peer),
+            lambda: cls._load_dialog_page(
+                user_id, session_string, limit, offset_date, offset_id, offset_peer, folder, chat_type
+            )
+        )
+
+    @classmethod
+    async def _load_dialog_page(
+        cls, user_id: int, session_string: str, limit: int, offset_date: Optional[datetime],
+        offset_id: int, offset_peer: Optional[int], folder: int, chat_type: Optional[str]
+    ) -> dict:
+        """Scan dialogs from the offsets until `limit` of them match the type filter
+
+        The scan is capped at DIALOG_SCAN_LIMIT dialogs per request, so a sparse
+        type can return a short page that still has a `next_offset`.
+        """
+        from telethon.errors import FloodWaitError
+        from telethon.tl.types import InputPeerEmpty
         
-        if not session_data:
+        scan_limit = settings.DIALOG_SCAN_LIMIT if chat_type else limit
+        dialogs = []
+        scanned = 0
+        last_seen = None
+        last_with_message = None
+        
+        try:
+            async with client_pool.connection(user_id, session_string) as client:
+                input_peer = InputPeerEmpty()
+                if offset_peer is not None:
+                    try:
+                        input_peer = await client.get_input_entity(offset_peer)
+                    except ValueError:
+                        # A client that has not seen the peer lacks its access hash;
+                        # the offset date and message ID still place the page
+                        pass
+                
+                scan = client.iter_dialogs(
+                    limit=scan_limit,
+                    offset_date=offset_date,
+                    offset_id=offset_id,
+                    offset_peer=input_peer,
+                    # Pinned dialogs only belong on the first page
+                    ignore_pinned=offset_peer is not None,
+                    folder=folder
+                )
+                
+                with TELEGRAM_LATENCY.labels("dialogs").time():
+                    async for dialog in scan:
+                        scanned += 1
+                        last_seen = dialog
+                        if dialog.message:
+                            last_with_message = dialog
+                        
+                        chat = cls._format_dialog(dialog)
+                        if chat_type is None or chat["type"] == chat_type:
+                            dialogs.append(chat)
+                            if len(dialogs) == limit:
+                                break
+        
+        except (HTTPException, FloodWaitError):
+            raise
+        except ValueError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No active Telegram session found"
+                detail=f"Invalid dialog offset: {str(e)}"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to load dialogs: {str(e)}"
             )
         
-        client = None
+        # A full page or a scan stopped at its cap may have more dialogs after it
+        next_offset = None
+        if (len(dialogs) == limit or scanned == scan_limit) and last_with_message is not None:
+            next_offset = {
+                "offset_date": last_with_message.message.date.isoformat(),
+                "offset_id": last_with_message.message.id,
+                "offset_peer": last_seen.id
+            }
+        
+        return {"dialogs": dialogs, "next_offset": next_offset}
+
+    @classmethod
+    async def _get_folder_listing(cls, user_id: int, session_string: str, folder: int) -> List[dict]:
+        """Get every dialog of a folder, enumerated at most once per cache TTL"""
+        chats = _folder_listings.get((user_id, folder))
+        if chats is not None:
+            return chats
+        
+        chats = await telegram_scheduler.run(
+            user_id, ("folder", user_id, folder), lambda: cls._load_folder(user_id, session_string, folder)
+        )
+        _folder_listings.set((user_id, folder), chats)
+        return chats
+
+    @classmethod
+    async def _load_folder(cls, user_id: int, session_string: str, folder: int) -> List[dict]:
+        """Enumerate all dialogs of a folder from Telegram"""
+        from telethon.errors import FloodWaitError
+        
         try:
-            client = TelegramClient(StringSession(session_data["session_string"]), settings.TELEGRAM_API_ID, settings.TELEGRAM_API_HASH)
-            await client.connect()
-            
-            if not await client.is_user_authorized():
+            async with client_pool.connection(user_id, session_string) as client:
+                with TELEGRAM_LATENCY.labels("dialogs").time():
+                    dialogs = [dialog async for dialog in client.iter_dialogs(folder=folder)]
+                return [cls._format_dialog(dialog) for dialog in dialogs]
+        
+        except (HTTPException, FloodWaitError):
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to load dialogs: {str(e)}"
+            )
+
+    @staticmethod
+    def _sorted_dialog_page(chats: List[dict], limit: int, offset_peer: Optional[int],
+                            chat_type: Optional[str], sort: str) -> dict:
+        """Sort and filter a complete folder listing and cut the page after `offset_peer`"""
+        key = DIALOG_SORT_KEYS[sort]
+        ordered = sorted(
+            (chat for chat in chats if chat_type is None or chat["type"] == chat_type),
+            key=key
+        )
+        
+        start = 0
+        if offset_peer is not None:
+            cursor = next((chat for chat in chats if chat["id"] == offset_peer), None)
+            if cursor is None:
                 raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Telegram session expired. Please reconnect."
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Dialog offset is no longer listed, start again from the first page"
                 )
+            cursor_key = key(cursor)
+            start = next((i for i, chat in enumerate(ordered) if key(chat) > cursor_key), len(ordered))
+        
+        page = ordered[start:start + limit]
+        next_offset = None
+        if start + limit < len(ordered):
+            next_offset = {"offset_date": None, "offset_id": 0, "offset_peer": page[-1]["id"]}
+        
+        return {"dialogs": page, "next_offset": next_offset}
+
+    @classmethod
+    def _format_dialog(cls, dialog) -> dict:
+        """Convert a Telethon dialog into the API chat shape"""
+        chat_type = "user"
+        if dialog.is_channel:
+            chat_type = "channel"
+        elif dialog.is_group:
+            chat_type = "group"
+        
+        return {
+            "id": dialog.id,
+            "title": dialog.title or "Unnamed Chat",
+            "type": chat_type,
+            "unread_count": dialog.unread_count,
+            "last_message": cls._format_message(dialog.message) if dialog.message else None
+        }
+
+    @staticmethod
+    def _format_message(message, names: Optional[Dict[int, str]] = None) -> dict:
+        """Convert a Telethon message into the API message shape
+
+        `names` holds already resolved sender display names keyed by sender ID.
+        """
+        from_user = "Unknown"
+        from_user_id = None
+        
+        if names and message.sender_id in names:
+            from_user = names[message.sender_id]
+            from_user_id = message.sender_id
+        elif message.sender:
+            from_user = display_name(message.sender) or "Unknown"
+            from_user_id = message.sender_id
+        
+        message_text = message.text or "[Media/System message]"
+        media_type = None
+        if hasattr(message, 'media') and message.media:
+            if message.photo:
+                message_text, media_type = "[Photo]", "photo"
+            elif message.video:
+                message_text, media_type = "[Video]", "video"
+            elif message.voice:
+                message_text, media_type = "[Voice message]", "voice"
+            elif message.sticker:
+                message_text, media_type = "[Sticker]", "sticker"
+            elif message.document:
+                message_text, media_type = "[Document]", "document"
+        
+        return {
+            "id": message.id,
+            "text": message_text,
+            "date": message.date.isoformat(),
+            "from_user": from_user,
+            "from_user_id": from_user_id,
+            "media_type": media_type
+        }
+
+    @classmethod
+    async def _fetch_messages(cls, client: "TelegramClient", user_id: int, chat_id: int, limit: int, **kwargs) -> List[dict]:
+        """Fetch messages from Telegram, newest first"""
+        with TELEGRAM_LATENCY.labels("messages").time():
+            raw_messages = [message async for message in client.iter_messages(chat_id, limit=limit, **kwargs)]
+        names = await sender_cache.resolve(user_id, raw_messages)
+        return [cls._format_message(message, names) for message in raw_messages]
+
+    @classmethod
+    async def _sync_newest(cls, client: "TelegramClient", user_id: int, chat_id: int, limit: int):
+        """Fetch only messages newer than the stored ones into the local store"""
+        state = await run_db(MessageDB.get_sync_state, user_id, chat_id)
+        
+        # Checked recently enough, trust the stored newest end
+        if state and state["synced_age"] < settings.MESSAGE_FRESH_TTL:
+            return
+        
+        if state:
+            fresh = await cls._fetch_messages(client, user_id, chat_id, limit, min_id=state["newest_id"])
+            if len(fresh) < limit:
+                # Saved even when empty, to record when the newest end was checked
+                await run_db(
+                    MessageDB.save_messages, user_id, chat_id, fresh,
+                    state["oldest_id"], fresh[0]["id"] if fresh else state["newest_id"],
+                    bool(state["history_complete"])
+                )
+                return
             
-            messages = []
-            async for message in client.iter_messages(chat_id, limit=limit):
-                from_user = "Unknown"
-                from_user_id = None
-                
-                if message.sender:
-                    if hasattr(message.sender, 'first_name') and message.sender.first_name:
-                        from_user = message.sender.first_name
-                        if hasattr(message.sender, 'last_name') and message.sender.last_name:
-                            from_user += f" {message.sender.last_name}"
-                    elif hasattr(message.sender, 'title') and message.sender.title:
-                        from_user = message.sender.title
-                    elif hasattr(message.sender, 'username') and message.sender.username:
-                        from_user = f"@{message.sender.username}"
-                    
-                    from_user_id = message.sender_id
-                
-                message_text = message.text or "[Media/System message]"
-                if hasattr(message, 'media') and message.media:
-                    if message.photo:
-                        message_text = "[Photo]"
-                    elif message.video:
-                        message_text = "[Video]" 
-                    elif message.document:
-                        message_text = "[Document]"
-                    elif message.voice:
-                        message_text = "[Voice message]"
-                    elif message.sticker:
-                        message_text = "[Sticker]"
-                
-                messages.append({
-                    "id": message.id,
-                    "text": message_text,
-                    "date": message.date.isoformat(),
-                    "from_user": from_user,
-                    "from_user_id": from_user_id
-                })
-            
+            # Too many new messages to bridge the gap, keep only the newest page
+            await run_db(MessageDB.clear_chat, user_id, chat_id)
+        else:
+            fresh = await cls._fetch_messages(client, user_id, chat_id, limit)
+        
+        if fresh:
+            await run_db(
+                MessageDB.save_messages, user_id, chat_id, fresh,
+                fresh[-1]["id"], fresh[0]["id"], len(fresh) < limit
+            )
+
+    @classmethod
+    async def _sync_older(cls, client: "TelegramClient", user_id: int, chat_id: int, count: int) -> bool:
+        """Extend the local store with up to `count` older messages, return False at the start of history"""
+        state = await run_db(MessageDB.get_sync_state, user_id, chat_id)
+        
+        if not state or state["history_complete"]:
+            return False
+        
+        older = await cls._fetch_messages(client, user_id, chat_id, count, offset_id=state["oldest_id"])
+        await run_db(
+            MessageDB.save_messages, user_id, chat_id, older,
+            older[-1]["id"] if older else state["oldest_id"], state["newest_id"], len(older) < count,
+            newest_synced=False
+        )
+        return bool(older)
+
+    @classmethod
+    async def _get_local_page(cls, user_id: int, chat_id: int, limit: int,
+                              before_id: Optional[int], after_id: Optional[int]) -> Optional[List[dict]]:
+        """Serve a page from the local store without Telegram, or None when the store cannot answer it
+
+        Pages whose newest end was synced within MESSAGE_MAX_STALE are served;
+        past MESSAGE_FRESH_TTL the chat is also revalidated in the background.
+        """
+        state = await run_db(MessageDB.get_sync_state, user_id, chat_id)
+        if not state or state["synced_age"] >= settings.MESSAGE_MAX_STALE:
+            return None
+        
+        complete = bool(state["history_complete"])
+        if after_id is not None:
+            if after_id < state["oldest_id"] and not complete:
+                return None
+            messages = await run_db(MessageDB.get_messages, user_id, chat_id, limit, before_id=before_id, after_id=after_id)
+        else:
+            if before_id is not None and before_id < state["oldest_id"] and not complete:
+                return None
+            messages = await run_db(MessageDB.get_messages, user_id, chat_id, limit, before_id=before_id)
+            # Too short a page needs older history from Telegram
+            if len(messages) < limit and not complete:
+                return None
+        
+        if state["synced_age"] >= settings.MESSAGE_FRESH_TTL:
+            cls._revalidate_chat(user_id, chat_id, limit)
+        return messages
+
+    @classmethod
+    def _revalidate_chat(cls, user_id: int, chat_id: int, limit: int):
+        """Sync the chat's newest messages in the background"""
+        task = asyncio.create_task(cls.sync_chat(user_id, chat_id, limit))
+        _revalidations.add(task)
+        task.add_done_callback(_on_revalidated)
+
+    @classmethod
+    async def _get_older_page(cls, client: "TelegramClient", user_id: int, chat_id: int,
+                              limit: int, before_id: Optional[int]) -> List[dict]:
+        """Get the page of messages ending right before `before_id` (or the newest page)"""
+        state = await run_db(MessageDB.get_sync_state, user_id, chat_id)
+        
+        if before_id is None or not state or before_id > state["newest_id"]:
+            await cls._sync_newest(client, user_id, chat_id, limit)
+            state = await run_db(MessageDB.get_sync_state, user_id, chat_id)
+        
+        # Cursor points below the stored range, read straight from Telegram
+        if before_id is not None and (not state or (before_id < state["oldest_id"] and not state["history_complete"])):
+            return await cls._fetch_messages(client, user_id, chat_id, limit, offset_id=before_id)
+        
+        messages = await run_db(MessageDB.get_messages, user_id, chat_id, limit, before_id=before_id)
+        
+        # Fill older history on demand when the store is too short
+        if len(messages) < limit and await cls._sync_older(client, user_id, chat_id, limit - len(messages)):
+            messages = await run_db(MessageDB.get_messages, user_id, chat_id, limit, before_id=before_id)
+        
+        return messages
+
+    @classmethod
+    async def _get_newer_page(cls, client: "TelegramClient", user_id: int, chat_id: int,
+                              limit: int, after_id: int, before_id: Optional[int]) -> List[dict]:
+        """Get the page of messages starting right after `after_id`"""
+        await cls._sync_newest(client, user_id, chat_id, limit)
+        state = await run_db(MessageDB.get_sync_state, user_id, chat_id)
+        
+        # Cursor points below the stored range, read straight from Telegram
+        if not state or (after_id < state["oldest_id"] and not state["history_complete"]):
+            messages = await cls._fetch_messages(
+                client, user_id, chat_id, limit, min_id=after_id, max_id=before_id or 0, reverse=True
+            )
+            messages.reverse()
             return messages
+        
+        return await run_db(MessageDB.get_messages, user_id, chat_id, limit, before_id=before_id, after_id=after_id)
+
+    @classmethod
+    async def get_messages(cls, user_id: int, chat_id: int, limit: int = 50,
+                           before_id: Optional[int] = None, after_id: Optional[int] = None) -> dict:
+        """Get a page of messages from a specific chat, newest first"""
+        session_string = await cls._get_session_string(user_id)
+        
+        messages = await cls._get_local_page(user_id, chat_id, limit, before_id, after_id)
+        if messages is not None:
+            return cls._message_page(messages, limit, after_id)
+        
+        async def load_page() -> List[dict]:
+            async with client_pool.connection(user_id, session_string) as client:
+                if after_id is not None:
+                    return await cls._get_newer_page(client, user_id, chat_id, limit, after_id, before_id)
+                return await cls._get_older_page(client, user_id, chat_id, limit, before_id)
+        
+        try:
+            messages = await telegram_scheduler.run(
+                user_id, ("messages", user_id, chat_id, limit, before_id, after_id), load_page
+            )
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to load messages: {str(e)}"
             )
-        finally:
-            if client:
-                await client.disconnect()
+        
+        return cls._message_page(messages, limit, after_id)
+
+    @staticmethod
+    def _message_page(messages: List[dict], limit: int, after_id: Optional[int]) -> dict:
+        """Wrap messages into a page with its cursors"""
+        # A full page means there may be more history behind it
+        return {
+            "messages": messages,
+            "next_before_id": messages[-1]["id"] if len(messages) == limit and after_id is None else None,
+            "next_after_id": messages[0]["id"] if messages else after_id
+        }
+
+    @classmethod
+    async def sync_chat(cls, user_id: int, chat_id: int, limit: int = 50):
+        """Pull the newest messages of a chat into the local store"""
+        session_string = await cls._get_session_string(user_id)
+        
+        async def sync():
+            async with client_pool.connection(user_id, session_string) as client:
+                await cls._sync_newest(client, user_id, chat_id, limit)
+        
+        await telegram_scheduler.run(user_id, ("sync", user_id, chat_id), sync)
 
     @classmethod
-    def disconnect_user(cls, user_id: int) -> dict:
+    async def get_messages_batch(cls, user_id: int, chats: List[Tuple[int, int]]) -> Dict[int, dict]:
+        """Get the newest messages of several chats concurrently over one client"""
+        session_string = await cls._get_session_string(user_id)
+        semaphore = asyncio.Semaphore(settings.BATCH_FETCH_CONCURRENCY)
+        
+        async def fetch_chat(client: "TelegramClient", chat_id: int, limit: int) -> Tuple[int, dict]:
+            async with semaphore:
+                try:
+                    messages = await telegram_scheduler.run(
+                        user_id, None, lambda: cls._get_older_page(client, user_id, chat_id, limit, None)
+                    )
+                    return chat_id, {"messages": messages, "error": None}
+                except HTTPException as e:
+                    return chat_id, {"messages": [], "error": e.detail}
+                except Exception as e:
+                    return chat_id, {"messages": [], "error": f"Failed to load messages: {str(e)}"}
+        
+        # Chats the local store can answer do not need a client at all
+        results = {}
+        remote = {}
+        for chat_id, limit in dict(chats).items():
+            messages = await cls._get_local_page(user_id, chat_id, limit, None, None)
+            if messages is not None:
+                results[chat_id] = {"messages": messages, "error": None}
+            else:
+                remote[chat_id] = limit
+        
+        if remote:
+            async with client_pool.connection(user_id, session_string) as client:
+                results.update(await asyncio.gather(*(
+                    fetch_chat(client, chat_id, limit) for chat_id, limit in remote.items()
+                )))
+        
+        return {chat_id: results[chat_id] for chat_id in dict(chats)}
+
+    @classmethod
+    async def open_export(cls, user_id: int, chat_id: int, export_format: str = "ndjson", after_id: int = 0) -> AsyncIterator[str]:
+        """Fetch the first chunk and return a generator streaming the chat's history oldest first
+
+        Fetching before the response starts keeps session errors HTTP errors. Every
+        chunk borrows the client and goes through the scheduler on its own, so a
+        long export shares the account's request budget and pins no connection.
+        Every record carries its message ID; passing the last received ID as
+        `after_id` resumes an interrupted export.
+        """
+        session_string = await cls._get_session_string(user_id)
+        chunk = await cls._fetch_export_chunk(user_id, session_string, chat_id, after_id)
+        return cls._export_chunks(user_id, session_string, chat_id, export_format, chunk)
+
+    @classmethod
+    async def _fetch_export_chunk(cls, user_id: int, session_string: str, chat_id: int, last_id: int) -> List[dict]:
+        """Fetch the EXPORT_CHUNK_SIZE messages following `last_id`, waiting out FloodWaits"""
+        async def fetch() -> List[dict]:
+            async with client_pool.connection(user_id, session_string) as client:
+                with TELEGRAM_LATENCY.labels("messages").time():
+                    messages = [
+                        message async for message in client.iter_messages(
+                            chat_id, limit=settings.EXPORT_CHUNK_SIZE, min_id=last_id, reverse=True
+                        )
+                    ]
+                names = await sender_cache.resolve(user_id, messages)
+            return [cls._format_message(m, names) for m in messages]
+        
+        try:
+            return await telegram_scheduler.run(
+                user_id, None, fetch, deadline=settings.EXPORT_FLOOD_WAIT_MAX_SLEEP
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to export chat: {str(e)}"
+            )
+
+    @classmethod
+    async def _export_chunks(cls, user_id: int, session_string: str, chat_id: int,
+                             export_format: str, chunk: List[dict]) -> AsyncIterator[str]:
+        """Yield encoded chunks until Telegram returns a short one"""
+        if export_format == "csv":
+            yield cls._encode_export([], export_format, header=True)
+        
+        while True:
+            if chunk:
+                yield cls._encode_export(chunk, export_format)
+            if len(chunk) < settings.EXPORT_CHUNK_SIZE:
+                return
+            chunk = await cls._fetch_export_chunk(user_id, session_string, chat_id, chunk[-1]["id"])
+
+    @staticmethod
+    def _encode_export(messages: List[dict], export_format: str, header: bool = False) -> str:
+        """Encode messages as NDJSON lines or CSV rows"""
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=["id", "date", "from_user_id", "from_user", "media_type", "text"])
+            if header:
+                writer.writeheader()
+            writer.writerows(messages)
+            return buffer.getvalue()
+        
+        return "".join(json.dumps(message, ensure_ascii=False) + "\n" for message in messages)
+
+    @staticmethod
+    def _build_match_query(query: str) -> str:
+        """Turn free text into an FTS5 query: all words must match, the last one as a prefix"""
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        if terms:
+            terms[-1] += "*"
+        return " ".join(terms)
+
+    @classmethod
+    async def search_messages(cls, user_id: int, query: str, chat_id: Optional[int] = None, limit: int = 20) -> List[dict]:
+        """Search the locally synced messages of the user"""
+        match = cls._build_match_query(query)
+        if not match:
+            return []
+        
+        try:
+            return await run_db(MessageDB.search, user_id, match, chat_id, limit)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Search failed: {str(e)}"
+            )
+
+    @classmethod
+    async def disconnect_user(cls, user_id: int) -> dict:
         """Disconnect user's Telegram session"""
-        success = TelegramDB.deactivate_sessions(user_id)
+        success = await run_db(TelegramDB.deactivate_sessions, user_id)
+        await run_db(MessageDB.clear_user, user_id)
+        await run_db(MediaDB.clear_user, user_id)
+        await run_db(ChatSummaryDB.clear_user, user_id)
+        dialog_cache.invalidate(user_id)
+        cls._forget_folders(user_id)
+        await sender_cache.forget_user(user_id)
+        await client_pool.release(user_id)
         
         if success:
             return {"message": "Telegram account disconnected successfully"}
         else:
             return {"message": "No active sessions found"}
 
+    @staticmethod
+    def _forget_folders(user_id: int):
+        """Drop the user's cached folder listings"""
+        for folder in DIALOG_FOLDERS:
+            _folder_listings.invalidate((user_id, folder))
+
     @classmethod
-    def get_status(cls, user_id: int) -> dict:
+    def _on_client_opened(cls, user_id: int, client: "TelegramClient"):
+        """Drop dialog listings cached before this worker (re)connected the account
+
+        Only the worker holding an account's client serves its Telegram requests,
+        so listings left from an earlier turn may have missed changes made while
+        another worker held it.
+        """
+        dialog_cache.discard(user_id)
+        cls._forget_folders(user_id)
+
+    @classmethod
+    async def get_status(cls, user_id: int) -> dict:
         """Get user's Telegram connection status"""
-        session_data = TelegramDB.get_active_session(user_id)
+        session_data = await run_db(TelegramDB.get_active_session, user_id)
         
         return {
             "connected": session_data is not None,
             "phone_number": session_data["phone_number"] if session_data else None
-        }
\ No newline at end of file
+        }
+
+# Cached dialog listings start over whenever this worker connects an account
+client_pool.add_open_hook(TelegramService._on_client_opened)
@@ -0,0 +1,166 @@
+import asyncio
+import json
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Set
+
+from ..database import ChatSummaryDB, MessageDB, run_db
+from ..config import settings
+from .client_pool import ClientLoan, client_pool
+from .scheduler import telegram_scheduler
+from .telegram_service import TelegramService
+
+if TYPE_CHECKING:
+    from telethon import TelegramClient
+
+class UpdateBroker:
+    """Applies Telethon update events of pooled clients and fans them out to subscribers
+
+    Handlers are added to every client the pool connects, so the local store and
+    chat summaries stay current whether or not anyone is streaming updates.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = settings.UPDATE_QUEUE_SIZE,
+        keepalive_interval: float = settings.UPDATE_KEEPALIVE_INTERVAL
+    ):
+        self.queue_size = queue_size
+        self.keepalive_interval = keepalive_interval
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    async def open_stream(self, user_id: int) -> "EventStream":
+        """Subscribe the user and return a Server-Sent Events stream
+
+        The session lookup and connection happen here, before the response starts,
+        so errors still surface as regular HTTP errors.
+        """
+        session_string = await TelegramService._get_session_string(user_id)
+        loan = await client_pool.lend(user_id, session_string)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return EventStream(self, user_id, queue, loan)
+
+    async def _events(self, client: "TelegramClient", queue: asyncio.Queue) -> AsyncIterator[str]:
+        """Yield queued updates as SSE frames until the client goes away"""
+        yield ": connected\n\n"
+        while client.is_connected():
+            try:
+                update = await asyncio.wait_for(queue.get(), timeout=self.keepalive_interval)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {update['event']}\ndata: {json.dumps(update['data'])}\n\n"
+
+    def _unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        """Drop a subscriber"""
+        subscribers = self._subscribers.get(user_id, set())
+        subscribers.discard(queue)
+        if not subscribers:
+            self._subscribers.pop(user_id, None)
+
+    def attach(self, user_id: int, client: "TelegramClient"):
+        """Register Telethon event handlers that update the store and publish to subscribers"""
+        from telethon import events, functions
+
+        async def on_new_message(event):
+            message = TelegramService._format_message(event.message)
+            await run_db(ChatSummaryDB.apply_new_message, user_id, event.chat_id, message, 0 if event.message.out else 1)
+            self._publish(user_id, "new_message", {"chat_id": event.chat_id, "message": message, "out": event.message.out})
+
+        async def on_message_edited(event):
+            message = TelegramService._format_message(event.message)
+            await run_db(MessageDB.update_message, user_id, event.chat_id, message)
+            await run_db(ChatSummaryDB.apply_edit, user_id, event.chat_id, message)
+            self._publish(user_id, "message_edited", {"chat_id": event.chat_id, "message": message})
+
+        async def on_message_deleted(event):
+            # Private chats and basic groups do not report the chat of deleted messages
+            await run_db(MessageDB.delete_messages, user_id, event.deleted_ids, event.chat_id)
+            # Chats that lost their last message fall back to the newest one still stored
+            last_messages = await run_db(ChatSummaryDB.apply_delete, user_id, event.deleted_ids, event.chat_id)
+            self._publish(user_id, "message_deleted", {
+                "chat_id": event.chat_id,
+                "ids": event.deleted_ids,
+                "last_messages": [
+                    {"chat_id": chat_id, "message": message} for chat_id, message in last_messages.items()
+                ]
+            })
+
+        async def count_unread(chat_id: int) -> int:
+            result = await client(functions.messages.GetPeerDialogsRequest(peers=[chat_id]))
+            return result.dialogs[0].unread_count
+
+        async def on_messages_read(event):
+            # Read on another device: the chat is read up to max_id
+            if not await run_db(ChatSummaryDB.mark_read, user_id, event.chat_id, event.max_id):
+                # Read part way: only Telegram knows how many of the later messages are incoming
+                unread = await telegram_scheduler.run(
+                    user_id, ("unread", user_id, event.chat_id), lambda: count_unread(event.chat_id)
+                )
+                await run_db(ChatSummaryDB.set_unread_count, user_id, event.chat_id, unread)
+            self._publish(user_id, "messages_read", {"chat_id": event.chat_id, "max_id": event.max_id})
+
+        handlers = [
+            (on_new_message, events.NewMessage()),
+            (on_message_edited, events.MessageEdited()),
+            (on_message_deleted, events.MessageDeleted()),
+            (on_messages_read, events.MessageRead(inbox=True)),
+        ]
+        for callback, event in handlers:
+            client.add_event_handler(callback, event)
+
+    def _publish(self, user_id: int, event: str, data: dict):
+        """Queue an update for every subscriber, dropping the oldest one for slow readers"""
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait({"event": event, "data": data})
+
+class EventStream:
+    """One subscriber's SSE frames, unsubscribing and returning the client exactly once
+
+    A response can be dropped before it iterates its body, in which case no
+    generator cleanup would ever run. Cleanup therefore happens when iteration
+    ends, on `aclose()` (the route schedules it as a background task) and, as a
+    last resort, when the stream is garbage collected.
+    """
+
+    def __init__(self, broker: UpdateBroker, user_id: int, queue: asyncio.Queue, loan: ClientLoan):
+        self._broker = broker
+        self._user_id = user_id
+        self._queue = queue
+        self._loan = loan
+        self._frames = broker._events(loan.client, queue)
+        self._closed = False
+
+    def __aiter__(self) -> "EventStream":
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            return await self._frames.__anext__()
+        except BaseException:
+            self.close()
+            raise
+
+    async def aclose(self):
+        """Stop the frame generator and clean up"""
+        try:
+            await self._frames.aclose()
+        finally:
+            self.close()
+
+    def close(self):
+        """Unsubscribe and return the client; later calls do nothing"""
+        if self._closed:
+            return
+        self._closed = True
+        self._broker._unsubscribe(self._user_id, self._queue)
+        self._loan.release()
+
+    def __del__(self):
+        self.close()
+
+# Shared update broker instance, attached to every client the pool connects
+update_broker = UpdateBroker()
+client_pool.add_open_hook(update_broker.attach)
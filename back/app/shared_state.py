@@ -0,0 +1,125 @@
+import abc
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+
+from .config import settings
+from .database import SharedStateDB, run_db
+
+# Identifies this process as the owner of leases
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class StateBackend(abc.ABC):
+    """State shared by all worker processes: expiring values and exclusive leases"""
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Get an unexpired value"""
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: str, ttl: float):
+        """Store a value for `ttl` seconds"""
+
+    @abc.abstractmethod
+    async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """Take or extend a lease; False while another owner holds it"""
+
+    @abc.abstractmethod
+    async def lease_owner(self, key: str) -> Optional[str]:
+        """Get the owner of an unexpired lease"""
+
+    @abc.abstractmethod
+    async def renew_leases(self, keys: List[str], owner: str, ttl: float) -> Set[str]:
+        """Extend leases, returning the ones still held"""
+
+    @abc.abstractmethod
+    async def release_lease(self, key: str, owner: str):
+        """Give up a lease"""
+
+    async def purge(self):
+        """Drop expired values and leases"""
+
+class MemoryStateBackend(StateBackend):
+    """Process-local state for single-worker deployments and tests"""
+
+    def __init__(self):
+        self._values: Dict[str, tuple] = {}
+        self._leases: Dict[str, list] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        value, expires_at = self._values.get(key, (None, 0.0))
+        return value if expires_at > time.time() else None
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._values[key] = (value, time.time() + ttl)
+
+    async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        lease = self._leases.get(key)
+        if lease and lease[0] != owner and lease[1] > time.time():
+            return False
+        self._leases[key] = [owner, time.time() + ttl]
+        return True
+
+    async def lease_owner(self, key: str) -> Optional[str]:
+        lease = self._leases.get(key)
+        return lease[0] if lease and lease[1] > time.time() else None
+
+    async def renew_leases(self, keys: List[str], owner: str, ttl: float) -> Set[str]:
+        held = set()
+        for key in keys:
+            lease = self._leases.get(key)
+            if lease and lease[0] == owner:
+                lease[1] = time.time() + ttl
+                held.add(key)
+        return held
+
+    async def release_lease(self, key: str, owner: str):
+        lease = self._leases.get(key)
+        if lease and lease[0] == owner:
+            del self._leases[key]
+
+    async def purge(self):
+        now = time.time()
+        self._values = {key: item for key, item in self._values.items() if item[1] > now}
+        self._leases = {key: lease for key, lease in self._leases.items() if lease[1] > now}
+
+class SQLiteStateBackend(StateBackend):
+    """State kept in the application database, shared by every worker on the host"""
+
+    async def get(self, key: str) -> Optional[str]:
+        return await run_db(SharedStateDB.get_value, key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await run_db(SharedStateDB.set_value, key, value, ttl)
+
+    async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return await run_db(SharedStateDB.acquire_lease, key, owner, ttl)
+
+    async def lease_owner(self, key: str) -> Optional[str]:
+        return await run_db(SharedStateDB.get_lease_owner, key)
+
+    async def renew_leases(self, keys: List[str], owner: str, ttl: float) -> Set[str]:
+        return await run_db(SharedStateDB.renew_leases, keys, owner, ttl)
+
+    async def release_lease(self, key: str, owner: str):
+        await run_db(SharedStateDB.release_lease, key, owner)
+
+    async def purge(self):
+        await run_db(SharedStateDB.delete_expired_state)
+
+STATE_BACKENDS = {
+    "memory": MemoryStateBackend,
+    "sqlite": SQLiteStateBackend,
+}
+
+def create_state_backend(name: str) -> StateBackend:
+    """Build the configured shared-state backend"""
+    try:
+        return STATE_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown STATE_BACKEND '{name}', expected one of: {', '.join(STATE_BACKENDS)}")
+
+# Shared state used by this process
+shared_state = create_state_backend(settings.STATE_BACKEND)
@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from .config import settings
+from .metrics import Stat, service_stats
+from .services.auth_service import UPDATES_SCOPE, AuthService
+from .services.client_pool import client_pool
+from .shared_state import WORKER_ID, StateBackend, shared_state
+
+if TYPE_CHECKING:
+    import httpx
+
+# Requests that use the account's Telegram client and therefore follow its lease
+ROUTED_PREFIX = "/api/telegram/"
+
+# Answered on the private socket only: this worker's service stats for /metrics
+STATS_PATH = "/_worker/stats"
+
+# Connection-level headers that are not relayed between workers
+HOP_BY_HOP_HEADERS = {
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailer", b"transfer-encoding", b"upgrade",
+}
+
+def worker_socket_path(worker_id: str) -> str:
+    """Unix socket on which a worker accepts requests forwarded by its peers"""
+    name = hashlib.blake2b(worker_id.encode(), digest_size=8).hexdigest()
+    return os.path.join(settings.WORKER_SOCKET_DIR, f"{name}.sock")
+
+class _ForwardedApp:
+    """Entry point of the private socket, marking requests as already routed"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            if scope["path"] == STATS_PATH:
+                await JSONResponse(service_stats.snapshot())(scope, receive, send)
+                return
+            scope = {**scope, "worker_forwarded": True}
+        await self.app(scope, receive, send)
+
+class WorkerProxy:
+    """Forwards each account's Telegram requests to the worker holding its client
+
+    With several workers every one also serves the app on a private Unix socket.
+    A request for an account leased by another worker is relayed there and the
+    response streamed back, so the account keeps a single connection, and its
+    caches, update handlers and rate limiter live in one process. Accounts no
+    worker holds are claimed by the worker that received the request.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.WORKERS > 1,
+        state: StateBackend = shared_state,
+        worker_id: str = WORKER_ID,
+        lease_ttl: float = settings.CLIENT_LEASE_TTL
+    ):
+        self.enabled = enabled
+        self.state = state
+        self.worker_id = worker_id
+        self.lease_ttl = lease_ttl
+        self.socket_path = worker_socket_path(worker_id)
+        self._server = None
+        self._clients: Dict[str, "httpx.AsyncClient"] = {}
+        self.forwarded = 0
+        self.failed = 0
+
+    async def start(self, app):
+        """Serve the app on this worker's private socket"""
+        if not self.enabled or self._server is not None:
+            return
+
+        import uvicorn
+
+        os.makedirs(settings.WORKER_SOCKET_DIR, mode=0o700, exist_ok=True)
+        config = uvicorn.Config(
+            _ForwardedApp(app), uds=self.socket_path, lifespan="off", log_level="warning", access_log=False
+        )
+        config.load()
+        server = uvicorn.Server(config)
+        # Server.serve() would replace the worker's signal handlers, so only start listening
+        server.lifespan = config.lifespan_class(config)
+        await server.startup()
+        os.chmod(self.socket_path, 0o600)
+        self._server = server
+
+    async def close(self):
+        """Stop serving forwarded requests and close connections to peers"""
+        await asyncio.gather(*(client.aclose() for client in self._clients.values()))
+        self._clients.clear()
+
+        if self._server is not None:
+            await self._server.shutdown()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    async def route(self, user_id: int) -> Optional[str]:
+        """Return the worker that serves the user's Telegram requests, None for this one"""
+        key = client_pool.lease_key(user_id)
+        while True:
+            owner = await self.state.lease_owner(key)
+            if owner == self.worker_id:
+                return None
+            if owner is not None:
+                return owner
+            # Nobody holds the account: claim it, or follow whoever was faster
+            if await self.state.acquire_lease(key, self.worker_id, self.lease_ttl):
+                return None
+
+    async def peer_stats(self) -> List[List[Stat]]:
+        """Service stats of the other running workers, for /metrics"""
+        if not self.enabled:
+            return []
+
+        paths = [
+            os.path.join(settings.WORKER_SOCKET_DIR, name) for name in os.listdir(settings.WORKER_SOCKET_DIR)
+            if name.endswith(".sock")
+        ]
+        snapshots = await asyncio.gather(*(
+            self._fetch_stats(path) for path in paths if path != self.socket_path
+        ))
+        return [snapshot for snapshot in snapshots if snapshot is not None]
+
+    async def _fetch_stats(self, path: str) -> Optional[List[Stat]]:
+        """Ask one worker for its stats; sockets left by crashed workers are skipped"""
+        import httpx
+
+        try:
+            response = await self._client(path).get(STATS_PATH, timeout=2.0)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError:
+            return None
+
+    def _client(self, path: str) -> "httpx.AsyncClient":
+        """Connection pool to a worker's private socket"""
+        import httpx
+
+        client = self._clients.get(path)
+        if client is None:
+            client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=path),
+                base_url="http://worker",
+                # Exports and update streams stay open for as long as the browser reads them
+                timeout=httpx.Timeout(None, connect=5.0),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=20)
+            )
+            self._clients[path] = client
+        return client
+
+    async def forward(self, owner: str, scope, receive, send):
+        """Relay a request to the owner's socket and stream its response back"""
+        import httpx
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        target = scope.get("raw_path") or scope["path"].encode()
+        if scope.get("query_string"):
+            target += b"?" + scope["query_string"]
+
+        client = self._client(worker_socket_path(owner))
+        request = client.build_request(
+            scope["method"], target.decode("latin-1"),
+            headers=[(name, value) for name, value in scope["headers"] if name not in HOP_BY_HOP_HEADERS],
+            content=bytes(body)
+        )
+
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.TransportError as e:
+            self.failed += 1
+            print(f"⚠️ Failed to forward {scope['path']} to worker {owner}: {e}")
+            # A crashed owner keeps the lease until it expires
+            error = JSONResponse(
+                {"detail": "Telegram connection is busy in another worker, please retry"},
+                status_code=503, headers={"Retry-After": str(int(self.lease_ttl))}
+            )
+            await error(scope, receive, send)
+            return
+
+        self.forwarded += 1
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(name, value) for name, value in response.headers.raw if name.lower() not in HOP_BY_HOP_HEADERS],
+            })
+
+            relay = asyncio.create_task(self._relay(response, send))
+            disconnect = asyncio.create_task(self._wait_for_disconnect(receive))
+            done, pending = await asyncio.wait({relay, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if relay in done:
+                relay.result()
+        finally:
+            await response.aclose()
+
+    @staticmethod
+    async def _relay(response: "httpx.Response", send):
+        """Pass the response body on chunk by chunk, as the owner produces it"""
+        async for chunk in response.aiter_raw():
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        """Return once the browser goes away, so a relayed stream is closed upstream"""
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+class WorkerRoutingMiddleware:
+    """ASGI middleware sending Telegram requests to the worker that owns the account"""
+
+    def __init__(self, app, proxy: Optional[WorkerProxy] = None):
+        self.app = app
+        self.proxy = proxy or worker_proxy
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self.proxy.enabled
+            or scope.get("worker_forwarded")
+            or not scope["path"].startswith(ROUTED_PREFIX)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = self._user_id(scope)
+        owner = await self.proxy.route(user_id) if user_id is not None else None
+        if owner is None:
+            await self.app(scope, receive, send)
+        else:
+            await self.proxy.forward(owner, scope, receive, send)
+
+    @staticmethod
+    def _user_id(scope: Dict[str, Any]) -> Optional[int]:
+        """User of the bearer token, or of the update stream's query token
+
+        Requests without a valid token are answered locally.
+        """
+        try:
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    scheme, _, token = value.decode("latin-1").partition(" ")
+                    if scheme.lower() != "bearer":
+                        return None
+                    return AuthService.verify_token(token.strip())
+
+            tokens = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("token")
+            if tokens:
+                return AuthService.verify_token(tokens[0], UPDATES_SCOPE)
+        except HTTPException:
+            return None
+        return None
+
+# Shared proxy instance, started and closed by the app lifespan
+worker_proxy = WorkerProxy()
+service_stats.register("worker_proxy", worker_proxy, counters=("forwarded", "failed"))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test of the API against an in-process fake Telegram backend
+
+Drives the auth endpoints, /api/telegram/chats and /api/telegram/messages/{chat_id}
+through the real app (routers, services, SQLite) with the Telegram client pool
+swapped for FakeTelegramClient, then reports p50/p95/p99 latency and requests
+per second for every scenario.
+
+Run from the back directory (requires httpx):
+    python benchmarks/bench_api.py --users 20 --concurrency 50 --requests 2000
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List
+
+BACK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("register", "login", "chats", "messages")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated scenarios to run")
+    parser.add_argument("--users", type=int, default=20, help="Accounts registered and used round robin")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario (register uses --users)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake Telegram round trip in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Random latency spread in seconds")
+    parser.add_argument("--dialogs", type=int, default=100, help="Dialogs per account")
+    parser.add_argument("--messages", type=int, default=1000, help="Messages per chat")
+    parser.add_argument("--page-size", type=int, default=50, help="Messages per /messages request")
+    parser.add_argument("--flood-every", type=int, default=0, help="Raise FloodWait on every Nth upstream call (0 = never)")
+    parser.add_argument("--flood-seconds", type=int, default=1, help="FloodWait duration in seconds")
+    parser.add_argument("--dialog-ttl", type=float, default=None, help="Override DIALOG_CACHE_TTL (0 = always refetch)")
+    return parser.parse_args()
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+async def run_scenario(
+    name: str,
+    total: int,
+    concurrency: int,
+    make_request: Callable[[int], Awaitable]
+) -> Dict:
+    """Fire `total` requests with at most `concurrency` in flight and collect timings"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    counter = itertools.count()
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            started = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "name": name,
+        "requests": total,
+        "ok": sum(count for code, count in statuses.items() if code < 400),
+        "statuses": dict(statuses),
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99)
+    }
+
+def print_report(results: List[Dict]):
+    print()
+    print(f"{'scenario':10} {'requests':>8} {'ok':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for r in results:
+        print(
+            f"{r['name']:10} {r['requests']:8d} {r['ok']:8d} {r['rps']:9.1f} "
+            f"{r['p50'] * 1000:8.1f} {r['p95'] * 1000:8.1f} {r['p99'] * 1000:8.1f}  {r['statuses']}"
+        )
+
+async def main(args: argparse.Namespace):
+    import httpx
+    from app.main import app
+    from app.database import TelegramDB, run_db
+    from app.services.client_pool import client_pool
+    from app.services.dialog_cache import dialog_cache
+    from app.services.scheduler import telegram_scheduler
+    from fake_telegram import FakeTelegramConfig, fake_client_factory
+
+    config = FakeTelegramConfig(
+        latency=args.latency, jitter=args.jitter, dialogs=args.dialogs,
+        messages_per_chat=args.messages, flood_every=args.flood_every, flood_seconds=args.flood_seconds
+    )
+    client_pool.client_factory = fake_client_factory(config)
+    if args.dialog_ttl is not None:
+        dialog_cache.ttl = args.dialog_ttl
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    password = "bench-password"
+    usernames = [f"bench_user_{i}" for i in range(args.users)]
+    tokens: List[str] = []
+    results = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+
+            async def register(i: int):
+                response = await http.post("/api/auth/register", json={"username": usernames[i], "password": password})
+                tokens.append(response.json()["access_token"])
+                return response
+
+            # Accounts are always needed; time them only when asked to
+            registered = await run_scenario("register", args.users, args.concurrency, register)
+            if "register" in scenarios:
+                results.append(registered)
+
+            # Give every account a (fake) Telegram session
+            for token in tokens:
+                me = await http.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+                await run_db(TelegramDB.save_session, me.json()["id"], f"bench-session-{me.json()['id']}", "+10000000000")
+
+            headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+
+            async def login(i: int):
+                return await http.post(
+                    "/api/auth/login", json={"username": usernames[i % args.users], "password": password}
+                )
+
+            async def chats(i: int):
+                return await http.get("/api/telegram/chats", headers=headers[i % len(headers)])
+
+            async def messages(i: int):
+                chat_id = random.randint(1, args.dialogs)
+                params = {"limit": args.page_size}
+                # Every other request pages into older history
+                if i % 2:
+                    params["before_id"] = random.randint(args.page_size + 1, args.messages)
+                return await http.get(f"/api/telegram/messages/{chat_id}", params=params, headers=headers[i % len(headers)])
+
+            for name, make_request in (("login", login), ("chats", chats), ("messages", messages)):
+                if name in scenarios:
+                    results.append(await run_scenario(name, args.requests, args.concurrency, make_request))
+
+    print_report(results)
+    print(
+        f"\nfake Telegram: {config.calls} upstream calls, {config.flood_waits} FloodWaits injected; "
+        f"scheduler: {telegram_scheduler.flood_waits} FloodWaits seen, {telegram_scheduler.coalesced} calls coalesced"
+    )
+
+if __name__ == "__main__":
+    arguments = parse_args()
+
+    # Keep the benchmark database (created relative to the working directory) out of the tree
+    os.environ.setdefault("SYNC_ENABLED", "false")
+    os.chdir(tempfile.mkdtemp(prefix="telegram-viewer-bench-"))
+    sys.path.insert(0, BACK_DIR)
+
+    asyncio.run(main(arguments))
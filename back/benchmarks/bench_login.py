@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Login throughput with scrypt password hashing
+
+Registers accounts through the real app, then fires concurrent logins at
+/api/auth/login and reports req/s and latency percentiles alongside the
+worst event loop stall observed meanwhile (a heartbeat task that should
+wake every millisecond). The "legacy" scenario seeds unsalted SHA-256 rows
+so each account is transparently rehashed on its first login.
+
+Run from the back directory (requires httpx):
+    python benchmarks/bench_login.py --users 50 --concurrency 50 --requests 500
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from bench_api import print_report, run_scenario
+
+BACK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Accounts logged into round robin")
+    parser.add_argument("--concurrency", type=int, default=50, help="Logins in flight at once")
+    parser.add_argument("--requests", type=int, default=500, help="Logins per scenario")
+    return parser.parse_args()
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.001) -> float:
+    """Longest delay past `interval` before the loop ran a sleeping task"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+async def main(args: argparse.Namespace):
+    import httpx
+    from app.main import app
+    from app.database import get_db_connection, run_db
+    from app.passwords import password_hasher
+
+    password = "bench-password"
+    usernames = [f"bench_user_{i}" for i in range(args.users)]
+    legacy_usernames = [f"legacy_user_{i}" for i in range(args.users)]
+    results = []
+    lags: List[float] = []
+
+    def seed_legacy_users():
+        legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+        with get_db_connection() as conn:
+            conn.executemany(
+                "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                [(username, legacy_hash) for username in legacy_usernames]
+            )
+            conn.commit()
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+
+            async def timed(name: str, total: int, make_request):
+                stop = asyncio.Event()
+                lag = asyncio.create_task(measure_loop_lag(stop))
+                results.append(await run_scenario(name, total, args.concurrency, make_request))
+                stop.set()
+                lags.append(await lag)
+
+            async def register(i: int):
+                return await http.post("/api/auth/register", json={"username": usernames[i], "password": password})
+
+            async def login(i: int):
+                return await http.post(
+                    "/api/auth/login", json={"username": usernames[i % args.users], "password": password}
+                )
+
+            async def legacy_login(i: int):
+                return await http.post(
+                    "/api/auth/login", json={"username": legacy_usernames[i % args.users], "password": password}
+                )
+
+            async def wrong_password(i: int):
+                return await http.post(
+                    "/api/auth/login", json={"username": usernames[i % args.users], "password": "not-the-password"}
+                )
+
+            await timed("register", args.users, register)
+            await timed("login", args.requests, login)
+            await timed("bad-login", args.requests, wrong_password)
+
+            await run_db(seed_legacy_users)
+            await timed("legacy", args.requests, legacy_login)
+
+    print_report(results)
+    print(f"\n{'scenario':10} {'max loop stall ms':>18}")
+    for result, lag in zip(results, lags):
+        print(f"{result['name']:10} {lag * 1000:18.1f}")
+    print(
+        f"\nscrypt n={password_hasher.n} r={password_hasher.r} p={password_hasher.p}; "
+        f"{password_hasher.hashed} hashed, {password_hasher.verified} verified, "
+        f"{password_hasher.failed} failed, {password_hasher.legacy} legacy hashes upgraded"
+    )
+
+if __name__ == "__main__":
+    arguments = parse_args()
+
+    # Keep the benchmark database (created relative to the working directory) out of the tree
+    os.environ.setdefault("SYNC_ENABLED", "false")
+    os.chdir(tempfile.mkdtemp(prefix="telegram-viewer-bench-"))
+    sys.path.insert(0, BACK_DIR)
+
+    asyncio.run(main(arguments))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Per-message serialization cost of a 100-message page
+
+Compares the default FastAPI path (validate the dicts through the MessagePage
+response model, then JSON-encode the result) with the direct ORJSONResponse
+path used by the message endpoints.
+
+Run from the back directory: python benchmarks/bench_serialization.py
+"""
+
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from fastapi._compat import ModelField
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from pydantic.fields import FieldInfo
+
+from app.models.telegram import MessagePage
+
+PAGE_SIZE = 100
+ROUNDS = 2000
+
+def build_page(size: int = PAGE_SIZE) -> dict:
+    """Build a page shaped like TelegramService.get_messages output"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = [
+        {
+            "id": 10000 - i,
+            "text": f"Message number {i} with a bit of text to make it realistic",
+            "date": (start + timedelta(minutes=i)).isoformat(),
+            "from_user": f"User {i % 7}",
+            "from_user_id": 1000 + i % 7,
+            "media_type": "photo" if i % 10 == 0 else None
+        }
+        for i in range(size)
+    ]
+    return {"messages": messages, "next_before_id": messages[-1]["id"], "next_after_id": messages[0]["id"]}
+
+def main():
+    page = build_page()
+    # The same response field FastAPI builds for response_model=MessagePage
+    field = ModelField(name="Response", field_info=FieldInfo(annotation=MessagePage), mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    def pydantic_path():
+        content = loop.run_until_complete(serialize_response(field=field, response_content=page, is_coroutine=True))
+        return JSONResponse(content).body
+
+    def orjson_path():
+        return ORJSONResponse(page).body
+
+    for name, func in (("response_model + JSONResponse", pydantic_path), ("ORJSONResponse (direct)", orjson_path)):
+        func()
+        best = min(timeit.repeat(func, number=ROUNDS, repeat=5)) / ROUNDS
+        print(f"{name:32} {best * 1e6:9.1f} µs/page {best * 1e6 / PAGE_SIZE:7.2f} µs/message")
+
+    loop.close()
+
+if __name__ == "__main__":
+    main()
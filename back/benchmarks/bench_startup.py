@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Cold start cost of the API
+
+Each run is a fresh interpreter that imports app.main and then goes through
+the lifespan startup (schema migrations, pools, workers) against a new
+database in a temporary directory. Reports the median and worst time of
+every phase and whether Telethon was imported before the first Telegram call.
+
+Run from the back directory: python benchmarks/bench_startup.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def startup():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({
+    "import": imported - started,
+    "lifespan": ready - imported,
+    "telethon_loaded": "telethon" in sys.modules,
+}))
+"""
+
+def run_probe(code: str) -> dict:
+    """Run a snippet in a fresh interpreter inside an empty working directory"""
+    env = {**os.environ, "PYTHONPATH": BACK_DIR, "SYNC_ENABLED": "false"}
+    with tempfile.TemporaryDirectory(prefix="telegram-viewer-startup-") as workdir:
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=workdir, env=env,
+            capture_output=True, text=True, check=True
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to start")
+    args = parser.parse_args()
+
+    interpreter = []
+    samples = []
+    for _ in range(args.runs):
+        interpreter.append(run_probe(
+            "import json, time; s = time.perf_counter(); import fastapi; "
+            "print(json.dumps({'fastapi': time.perf_counter() - s}))"
+        )["fastapi"])
+        samples.append(run_probe(PROBE))
+
+    phases = {
+        "import fastapi (floor)": interpreter,
+        "import app.main": [s["import"] for s in samples],
+        "lifespan startup": [s["lifespan"] for s in samples],
+        "import + startup": [s["import"] + s["lifespan"] for s in samples],
+    }
+
+    print(f"{'phase':24} {'median ms':>10} {'max ms':>10}")
+    for name, values in phases.items():
+        print(f"{name:24} {statistics.median(values) * 1000:10.1f} {max(values) * 1000:10.1f}")
+
+    loaded = sum(s["telethon_loaded"] for s in samples)
+    print(f"\nTelethon imported at startup in {loaded}/{len(samples)} runs (expected 0: it loads on first use)")
+
+if __name__ == "__main__":
+    main()
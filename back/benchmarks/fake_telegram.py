@@ -0,0 +1,132 @@
+"""
+In-process stand-in for TelegramClient used by the benchmarks
+
+Only the client surface the services touch is implemented. Every upstream
+call sleeps for the configured latency, and every `flood_every`-th call raises
+a FloodWaitError so the scheduler's pause/retry path is exercised too.
+"""
+
+import asyncio
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+from telethon.errors import FloodWaitError
+
+class FakeTelegramConfig:
+    """Shape and behavior of the fake Telegram backend"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.01,
+        dialogs: int = 100,
+        messages_per_chat: int = 1000,
+        flood_every: int = 0,
+        flood_seconds: int = 1
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.dialogs = dialogs
+        self.messages_per_chat = messages_per_chat
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.calls = 0
+        self.flood_waits = 0
+        self._counter = itertools.count(1)
+
+    async def upstream_call(self):
+        """Simulate one round trip to Telegram"""
+        self.calls += 1
+        if self.flood_every and next(self._counter) % self.flood_every == 0:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+class FakeSender:
+    __slots__ = ("id", "first_name", "last_name", "username")
+
+    def __init__(self, sender_id: int):
+        self.id = sender_id
+        self.first_name = f"User{sender_id}"
+        self.last_name = None
+        self.username = None
+
+class FakeMessage:
+    __slots__ = ("id", "chat_id", "text", "date", "sender", "sender_id", "media",
+                 "photo", "video", "document", "voice", "sticker", "file")
+
+    EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __init__(self, chat_id: int, message_id: int):
+        self.id = message_id
+        self.chat_id = chat_id
+        self.text = f"Message {message_id} in chat {chat_id}"
+        self.date = self.EPOCH + timedelta(minutes=message_id)
+        self.sender_id = 1000 + message_id % 17
+        self.sender = FakeSender(self.sender_id)
+        self.media = self.photo = self.video = self.document = self.voice = self.sticker = self.file = None
+
+class FakeDialog:
+    __slots__ = ("id", "title", "is_channel", "is_group", "unread_count", "message")
+
+    def __init__(self, dialog_id: int, top_message: FakeMessage):
+        self.id = dialog_id
+        self.title = f"Chat {dialog_id}"
+        self.is_channel = dialog_id % 5 == 0
+        self.is_group = dialog_id % 3 == 0
+        self.unread_count = dialog_id % 7
+        self.message = top_message
+
+class FakeTelegramClient:
+    """Authorized client whose chats all hold `messages_per_chat` messages"""
+
+    def __init__(self, session_string: str, config: FakeTelegramConfig):
+        self.session_string = session_string
+        self.config = config
+        self._connected = False
+        self._handlers = []
+
+    async def connect(self):
+        await asyncio.sleep(self.config.latency)
+        self._connected = True
+
+    async def disconnect(self):
+        self._connected = False
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def iter_dialogs(self, limit=None, **kwargs):
+        await self.config.upstream_call()
+        count = min(limit or self.config.dialogs, self.config.dialogs)
+        for dialog_id in range(1, count + 1):
+            yield FakeDialog(dialog_id, FakeMessage(dialog_id, self.config.messages_per_chat))
+
+    async def iter_messages(self, chat_id, limit=None, offset_id=0, min_id=0, max_id=0, reverse=False, **kwargs):
+        await self.config.upstream_call()
+        upper = self.config.messages_per_chat + 1
+        if offset_id:
+            upper = min(upper, offset_id)
+        if max_id:
+            upper = min(upper, max_id)
+
+        ids = range(min_id + 1, upper) if reverse else range(upper - 1, min_id, -1)
+        for message_id in itertools.islice(ids, limit):
+            yield FakeMessage(chat_id, message_id)
+
+    async def get_messages(self, chat_id, ids=None, **kwargs):
+        await self.config.upstream_call()
+        return FakeMessage(chat_id, ids)
+
+    def add_event_handler(self, callback, event=None):
+        self._handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event=None):
+        self._handlers.remove((callback, event))
+
+def fake_client_factory(config: FakeTelegramConfig):
+    """Build a client_factory for TelegramClientPool backed by `config`"""
+    return lambda session_string: FakeTelegramClient(session_string, config)
@@ -3,19 +3,40 @@
 Simple script to run the Telegram Message Viewer API
 """
 
+import os
+import shutil
+import tempfile
+
 import uvicorn
 from app.config import settings
 
+def prepare_multiprocess_metrics():
+    """Give the workers an empty directory for their Prometheus metric files
+
+    It has to be in the environment before the workers import prometheus_client.
+    """
+    path = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "telegram-viewer-metrics")
+    )
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
 if __name__ == "__main__":
+    if settings.WORKERS > 1:
+        prepare_multiprocess_metrics()
+    
     print(f"🚀 Starting {settings.APP_NAME} v{settings.VERSION}")
     print(f"📍 Server will run on http://{settings.HOST}:{settings.PORT}")
     print(f"📚 API docs available at http://{settings.HOST}:{settings.PORT}/docs")
+    print(f"👷 Workers: {settings.WORKERS} (shared state: {settings.STATE_BACKEND})")
     print("=" * 50)
     
     uvicorn.run(
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG,
+        # Auto-reload only supports a single worker process
+        reload=settings.DEBUG and settings.WORKERS == 1,
+        workers=settings.WORKERS,
         log_level="info" if not settings.DEBUG else "debug"
     )
\ No newline at end of file
@@ -29,6 +29,7 @@ const App = () => {
     status: telegramStatus,
     chats,
     messages,
+    nextBeforeId,
     loading: telegramLoading,
     error: telegramError,
     connect: telegramConnect,
@@ -108,8 +109,8 @@ const App = () => {
     loadChats();
   };
 
-  const handleLoadMessages = (chatId, limit) => {
-    loadMessages(chatId, limit);
+  const handleLoadMessages = (chatId, limit, beforeId) => {
+    loadMessages(chatId, limit, beforeId);
   };
 
   // Show loading screen on initial auth check
@@ -154,6 +155,7 @@ const App = () => {
         <MessageList
           chat={selectedChat}
           messages={messages}
+          nextBeforeId={nextBeforeId}
           onBack={handleBackToChats}
           onLoadMessages={handleLoadMessages}
           loading={telegramLoading}
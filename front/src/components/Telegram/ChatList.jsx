@@ -241,6 +241,18 @@ const ChatList = ({
                   )}
                 </div>
 
+                {chat.last_message && (
+                  <p className="chat-preview">
+                    {chat.type === CHAT_TYPES.GROUP &&
+                      chat.last_message.from_user && (
+                        <span className="chat-preview-sender">
+                          {chat.last_message.from_user}:{" "}
+                        </span>
+                      )}
+                    {chat.last_message.text}
+                  </p>
+                )}
+
                 <div className="chat-meta">
                   <span className="chat-type">
                     {getChatTypeLabel(chat.type)}
@@ -33,6 +33,7 @@ const getChatIcon = (type) => {
 const MessageList = ({
   chat,
   messages = [],
+  nextBeforeId = null,
   onBack,
   onLoadMessages,
   loading = false,
@@ -119,7 +120,7 @@ const MessageList = ({
   };
 
   const handleLoadMore = () => {
-    onLoadMessages(chat.id, messages.length + 50);
+    onLoadMessages(chat.id, TELEGRAM_CONFIG.DEFAULT_MESSAGE_LIMIT, nextBeforeId);
   };
 
   useEffect(() => {
@@ -212,7 +213,7 @@ const MessageList = ({
           <FiSearch className="search-icon" />
         </div>
 
-        {messages.length >= TELEGRAM_CONFIG.DEFAULT_MESSAGE_LIMIT && (
+        {nextBeforeId && (
           <Button
             onClick={handleLoadMore}
             variant="ghost"
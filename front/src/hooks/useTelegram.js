@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { telegramAPI } from "../services/api.js";
 import { SUCCESS_MESSAGES, TELEGRAM_CONFIG } from "../utils/constants.js";
 
@@ -7,8 +7,12 @@ export const useTelegram = (isAuthenticated = false) => {
   const [status, setStatus] = useState(null);
   const [chats, setChats] = useState([]);
   const [messages, setMessages] = useState([]);
+  // Cursor of the next older page; null once the start of history is reached
+  const [nextBeforeId, setNextBeforeId] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  // Chat whose messages are shown, so live updates of other chats skip them
+  const currentChatId = useRef(null);
 
   // Check Telegram connection status only when user is authenticated
   useEffect(() => {
@@ -24,6 +28,103 @@ export const useTelegram = (isAuthenticated = false) => {
     }
   }, [isAuthenticated]);
 
+  // Apply live updates while connected; the stream is reopened with a fresh
+  // token whenever it drops, since the old one has expired by then
+  useEffect(() => {
+    if (!isAuthenticated || !isConnected) {
+      return undefined;
+    }
+
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const updateChat = (chatId, update) =>
+      setChats((prev) =>
+        prev.map((chat) => (chat.id === chatId ? { ...chat, ...update(chat) } : chat))
+      );
+
+    const handlers = {
+      new_message: ({ chat_id, message, out }) => {
+        setChats((prev) => {
+          const chat = prev.find((item) => item.id === chat_id);
+          if (!chat) {
+            return prev;
+          }
+          const updated = {
+            ...chat,
+            last_message: message,
+            unread_count: chat.unread_count + (out ? 0 : 1),
+          };
+          return [updated, ...prev.filter((item) => item.id !== chat_id)];
+        });
+        if (currentChatId.current === chat_id) {
+          setMessages((prev) =>
+            prev.some((item) => item.id === message.id) ? prev : [message, ...prev]
+          );
+        }
+      },
+      message_edited: ({ chat_id, message }) => {
+        updateChat(chat_id, (chat) =>
+          chat.last_message?.id === message.id ? { last_message: message } : {}
+        );
+        if (currentChatId.current === chat_id) {
+          setMessages((prev) =>
+            prev.map((item) => (item.id === message.id ? message : item))
+          );
+        }
+      },
+      message_deleted: ({ chat_id, ids, last_messages }) => {
+        last_messages.forEach(({ chat_id: chatId, message }) =>
+          updateChat(chatId, () => ({ last_message: message }))
+        );
+        // Private chats and basic groups do not report the chat of deleted messages
+        if (chat_id === null || currentChatId.current === chat_id) {
+          setMessages((prev) => prev.filter((item) => !ids.includes(item.id)));
+        }
+      },
+      messages_read: ({ chat_id, max_id }) => {
+        // A partial read is recounted by the server and shows on the next load
+        updateChat(chat_id, (chat) =>
+          !chat.last_message || chat.last_message.id <= max_id ? { unread_count: 0 } : {}
+        );
+      },
+    };
+
+    const open = async () => {
+      try {
+        const { token } = await telegramAPI.getUpdatesToken();
+        if (closed) {
+          return;
+        }
+        source = telegramAPI.openUpdates(token);
+        Object.entries(handlers).forEach(([event, handler]) =>
+          source.addEventListener(event, (e) => handler(JSON.parse(e.data)))
+        );
+        source.onerror = () => {
+          source.close();
+          retry();
+        };
+      } catch (error) {
+        console.error("Failed to open Telegram updates:", error);
+        retry();
+      }
+    };
+
+    const retry = () => {
+      if (!closed) {
+        retryTimer = setTimeout(open, TELEGRAM_CONFIG.UPDATES_RETRY_DELAY);
+      }
+    };
+
+    open();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      source?.close();
+    };
+  }, [isAuthenticated, isConnected]);
+
   const checkStatus = useCallback(async () => {
     // Don't check status if user is not authenticated
     if (!isAuthenticated) {
@@ -141,7 +242,7 @@ export const useTelegram = (isAuthenticated = false) => {
     setError(null);
 
     try {
-      const chatsData = await telegramAPI.getChats();
+      const chatsData = await telegramAPI.getChatSummaries();
       setChats(chatsData);
       return { success: true, data: chatsData };
     } catch (error) {
@@ -153,18 +254,27 @@ export const useTelegram = (isAuthenticated = false) => {
   }, [isAuthenticated]);
 
   const loadMessages = useCallback(
-    async (chatId, limit = TELEGRAM_CONFIG.DEFAULT_MESSAGE_LIMIT) => {
+    async (chatId, limit = TELEGRAM_CONFIG.DEFAULT_MESSAGE_LIMIT, beforeId = null) => {
       if (!isAuthenticated) {
         return { success: false, error: "User not authenticated" };
       }
 
       setLoading(true);
       setError(null);
+      currentChatId.current = chatId;
 
       try {
-        const messagesData = await telegramAPI.getMessages(chatId, limit);
-        setMessages(messagesData);
-        return { success: true, data: messagesData };
+        const cursor = beforeId ? { before_id: beforeId } : {};
+        const page = await telegramAPI.getMessages(chatId, limit, cursor);
+
+        // Older pages are appended after the already loaded messages
+        if (beforeId) {
+          setMessages((prev) => [...prev, ...page.messages]);
+        } else {
+          setMessages(page.messages);
+        }
+        setNextBeforeId(page.next_before_id ?? null);
+        return { success: true, data: page };
       } catch (error) {
         setError(error.message);
         return { success: false, error: error.message };
@@ -180,7 +290,9 @@ export const useTelegram = (isAuthenticated = false) => {
   }, []);
 
   const clearMessages = useCallback(() => {
+    currentChatId.current = null;
     setMessages([]);
+    setNextBeforeId(null);
   }, []);
 
   return {
@@ -188,6 +300,7 @@ export const useTelegram = (isAuthenticated = false) => {
     status,
     chats,
     messages,
+    nextBeforeId,
     loading,
     error,
     connect,
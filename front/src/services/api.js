@@ -134,10 +134,17 @@ export const telegramAPI = {
   connect: (phoneData) => apiClient.post("/telegram/connect", phoneData),
   verify: (verifyData) => apiClient.post("/telegram/verify", verifyData),
   getChats: () => apiClient.get("/telegram/chats"),
-  getMessages: (chatId, limit = 50) =>
-    apiClient.get(`/telegram/messages/${chatId}`, { limit }),
+  getChatSummaries: () => apiClient.get("/telegram/chats/summary"),
+  getMessages: (chatId, limit = 50, cursor = {}) =>
+    apiClient.get(`/telegram/messages/${chatId}`, { limit, ...cursor }),
   disconnect: () => apiClient.post("/telegram/disconnect"),
   getStatus: () => apiClient.get("/telegram/status"),
+  // EventSource cannot send headers, so the stream takes a short-lived token
+  getUpdatesToken: () => apiClient.post("/telegram/updates/token"),
+  openUpdates: (token) =>
+    new EventSource(
+      `${API_BASE_URL}/telegram/updates?${new URLSearchParams({ token })}`
+    ),
 };
 
 // General API
@@ -19,6 +19,8 @@ export const TELEGRAM_CONFIG = {
   MAX_MESSAGE_LIMIT: 100,
   DEFAULT_MESSAGE_LIMIT: 50,
   PHONE_REGEX: /^\+[1-9]\d{1,14}$/,
+  // Delay before reopening a dropped update stream (ms)
+  UPDATES_RETRY_DELAY: 5000,
 };
 
 // UI Constants